@@ -0,0 +1,145 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import F, Q
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from netbox.config import get_config
+
+
+class BackupCursorPagination(BasePagination):
+    """
+    Keyset pagination of backups on `(last_processed, id)`.
+
+    Each page ends with a `next` link holding an opaque cursor (the `(last_processed, id)` of the last row); the next
+    page is read from the `backup_plugin_backup_keyset` index starting right after it, so a page deep into a large
+    table costs the same as the first one. Unlike the offset pagination of the other endpoints there is no `count`
+    (counting would scan the table) nor `previous` link.
+
+    Search results (`?q=`, see `BackupFilterSet.search`) are ordered by rank instead, which no index holds; their
+    cursor holds the offset of the next page.
+
+    Query parameters:
+        cursor: the cursor of the `next` link
+        limit: the page size (defaults to `PAGINATE_COUNT`, at most `MAX_PAGE_SIZE`)
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+            if limit <= 0:
+                raise ValueError()
+        except (KeyError, ValueError):
+            return get_config().PAGINATE_COUNT
+        if get_config().MAX_PAGE_SIZE:
+            return min(limit, get_config().MAX_PAGE_SIZE)
+        return limit
+
+    def decode_cursor(self, request):
+        """
+        Returns:
+            ((datetime|None), (int))|None: the `(last_processed, id)` position of the cursor, or None on the first page
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            last_processed, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return datetime.fromisoformat(last_processed) if last_processed else None, int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(_('Invalid cursor'))
+
+    def decode_offset(self, request):
+        """
+        Returns:
+            (int): the offset of a search results cursor, 0 on the first page
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return 0
+        try:
+            offset, = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            if int(offset) < 0:
+                raise ValueError()
+            return int(offset)
+        except (TypeError, ValueError):
+            raise NotFound(_('Invalid cursor'))
+
+    @staticmethod
+    def encode(position: list):
+        return base64.urlsafe_b64encode(json.dumps(position).encode('ascii')).decode('ascii')
+
+    @classmethod
+    def encode_cursor(cls, last_processed, pk):
+        return cls.encode([last_processed.isoformat() if last_processed else None, pk])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        limit = self.get_limit(request)
+
+        if 'rank' in queryset.query.annotations:
+            offset = self.decode_offset(request)
+            results = list(queryset.order_by('-rank', 'pk')[offset:offset + limit + 1])
+            self.next_cursor = self.encode([offset + limit]) if len(results) > limit else None
+            return results[:limit]
+
+        # rows without `last_processed` come first, as in the index
+        queryset = queryset.order_by(F('last_processed').asc(nulls_first=True), 'pk')
+        position = self.decode_cursor(request)
+        if position:
+            last_processed, pk = position
+            if last_processed is None:
+                queryset = queryset.filter(Q(last_processed__isnull=True, pk__gt=pk) | Q(last_processed__isnull=False))
+            else:
+                # the leading `>=` bounds the index scan, the rest skips the rows of the same instant already returned
+                queryset = queryset.filter(
+                    Q(last_processed__gte=last_processed) & (Q(last_processed__gt=last_processed) | Q(pk__gt=pk))
+                )
+
+        # one extra row tells whether there is a next page
+        results = list(queryset[:limit + 1])
+        self.next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            self.next_cursor = self.encode_cursor(results[-1].last_processed, results[-1].pk)
+        return results
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param, 'required': False, 'in': 'query',
+                'description': 'The cursor of the next page', 'schema': {'type': 'string'},
+            },
+            {
+                'name': self.limit_query_param, 'required': False, 'in': 'query',
+                'description': 'Number of results to return per page', 'schema': {'type': 'integer'},
+            },
+        ]
@@ -1,11 +1,85 @@
+from django.utils.translation import gettext as _
+from rest_framework import serializers
+
 from backup_plugin.models import Backup
+from backup_plugin.utils import diff
+from dcim.api.serializers import DeviceSerializer
 from netbox.api.serializers import NetBoxModelSerializer
 
+# the (large) diff payloads, left out of the responses unless requested with `?include=` (see `BackupViewSet`)
+HEAVY_FIELDS = ('diff', 'unified_diff')
+# measured from the unified diff (see `utils.diff.change_stats`)
+STATS_FIELDS = ('lines_added', 'lines_removed', 'hunk_count', 'section_count')
+
 
 class BackupSerializer(NetBoxModelSerializer):
+    device = DeviceSerializer(nested=True, required=False, allow_null=True)
+    orig_config = serializers.PrimaryKeyRelatedField(read_only=True)
+    rev_config = serializers.PrimaryKeyRelatedField(read_only=True)
+    diff = serializers.CharField(required=False, allow_blank=True)
+    unified_diff = serializers.CharField(required=False, allow_blank=True)
+
+    class Meta:
+        model = Backup
+        fields = (
+            'id', 'url', 'display', 'name', 'device', 'orig_id', 'rev_id', 'orig_config', 'rev_config', 'diff_info',
+            'changes', *STATS_FIELDS, 'last_processed', 'diff', 'unified_diff', 'tags', 'custom_fields', 'created',
+            'last_updated',
+        )
+        brief_fields = ('id', 'url', 'display', 'name')
+        read_only_fields = STATS_FIELDS
+
+    def validate(self, data):
+        # the searchable changed lines are derived from the unified diff unless given, its statistics always are
+        if 'unified_diff' in data:
+            data.update(diff.change_stats(data['unified_diff']))
+        if data.get('unified_diff') and not data.get('changes'):
+            data['changes'] = diff.changed_lines(data['unified_diff'])
+        return super().validate(data)
+
+
+class BackupBulkListSerializer(serializers.ListSerializer):
+
+    def validate(self, data):
+        # a backup given twice would be updated twice by the same upsert, which PostgreSQL rejects
+        seen = set()
+        duplicates = []
+        for row in data:
+            key = (row['name'], row['orig_id'], row['rev_id'])
+            if key in seen:
+                duplicates.append(key)
+            seen.add(key)
+        if duplicates:
+            raise serializers.ValidationError([
+                _('Duplicate backup {name} ({orig_id}, {rev_id})').format(name=name, orig_id=orig_id, rev_id=rev_id)
+                for name, orig_id, rev_id in duplicates
+            ])
+        return data
+
+
+class BackupBulkSerializer(serializers.ModelSerializer):
+    """
+    A flat backup, as accepted by the bulk upsert endpoint: related objects are given by id (checked once for the
+    whole request) and the unique constraint is not checked row by row, since existing backups are updated. A
+    backup given more than once in the same request is rejected.
+    """
+    device = serializers.IntegerField(source='device_id', required=False, allow_null=True)
+    orig_config = serializers.CharField(source='orig_config_id', required=False, allow_null=True, max_length=64)
+    rev_config = serializers.CharField(source='rev_config_id', required=False, allow_null=True, max_length=64)
+    diff = serializers.CharField(required=False, allow_blank=True)
+    unified_diff = serializers.CharField(required=False, allow_blank=True)
 
     class Meta:
         model = Backup
         fields = (
-            'id', 'name',
+            'name', 'device', 'orig_id', 'rev_id', 'orig_config', 'rev_config', 'diff_info', 'changes',
+            'last_processed', 'diff', 'unified_diff',
         )
+        validators = []
+        list_serializer_class = BackupBulkListSerializer
+
+    def validate(self, data):
+        data.update(diff.change_stats(data.get('unified_diff')))
+        if data.get('unified_diff') and not data.get('changes'):
+            data['changes'] = diff.changed_lines(data['unified_diff'])
+        return data
@@ -0,0 +1,8 @@
+from netbox.api.routers import NetBoxRouter
+
+from . import views
+
+router = NetBoxRouter()
+router.register('backups', views.BackupViewSet)
+
+urlpatterns = router.urls
@@ -0,0 +1,88 @@
+from functools import cached_property
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from dcim.models import Device
+from netbox.api.viewsets import NetBoxModelViewSet
+
+from backup_plugin import filtersets
+from backup_plugin.models import Backup, Configuration
+from .pagination import BackupCursorPagination
+from .serializers import HEAVY_FIELDS, BackupBulkSerializer, BackupSerializer
+
+
+class BackupViewSet(NetBoxModelViewSet):
+    """
+    Backups, cursor paginated on `(last_processed, id)` (see `BackupCursorPagination`).
+
+    The diff payloads (`diff` and `unified_diff`) are neither loaded nor returned unless requested, either with
+    `?include=diff,unified_diff` or in an explicit `?fields=` list.
+    """
+    queryset = Backup.objects.select_related('device').prefetch_related('tags')
+    serializer_class = BackupSerializer
+    filterset_class = filtersets.BackupFilterSet
+    pagination_class = BackupCursorPagination
+
+    @cached_property
+    def requested_fields(self):
+        if self.request.method not in SAFE_METHODS:
+            # the full serializer, so that every field can be written
+            return None
+        if fields := self.request.query_params.get('fields'):
+            return fields.split(',')
+        if self.brief:
+            return BackupSerializer.Meta.brief_fields
+
+        include = set(self.request.query_params.get('include', '').split(','))
+        return [f for f in BackupSerializer.Meta.fields if f not in HEAVY_FIELDS or f in include]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.requested_fields:
+            queryset = queryset.defer(*(f for f in HEAVY_FIELDS if f not in self.requested_fields))
+        return queryset
+
+    @action(detail=False, methods=['post'], url_path='bulk-upsert')
+    def bulk_upsert(self, request):
+        """
+        Create or update a list of backups in a few queries: a backup that already exists for the same `name`,
+        `orig_id` and `rev_id` is updated. Meant for ingesting thousands of backups per request; as with any bulk
+        operation no change log records are created and tags are not set.
+        """
+        if not request.user.has_perms(['backup_plugin.add_backup', 'backup_plugin.change_backup']):
+            raise PermissionDenied()
+        if not isinstance(request.data, list):
+            raise ValidationError(_('Expected a list of backups'))
+
+        serializer = BackupBulkSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        rows = serializer.validated_data
+
+        with transaction.atomic():
+            # the configurations checked here are kept until the backups referencing them are written
+            Configuration.lock()
+
+            # check the related objects once for the whole request
+            device_ids = {r['device_id'] for r in rows if r.get('device_id')}
+            missing_devices = device_ids - set(Device.objects.filter(pk__in=device_ids).values_list('pk', flat=True))
+            config_ids = {r[f] for r in rows for f in ('orig_config_id', 'rev_config_id') if r.get(f)}
+            missing_configs = config_ids - set(
+                Configuration.objects.filter(hash__in=config_ids).values_list('hash', flat=True))
+            if missing_devices or missing_configs:
+                raise ValidationError({
+                    'device': [_('Unknown device {id}').format(id=pk) for pk in sorted(missing_devices)],
+                    'config': [_('Unknown configuration {hash}').format(hash=h) for h in sorted(missing_configs)],
+                })
+
+            now = timezone.now()
+            backups = [Backup(**dict(r, last_processed=r.get('last_processed') or now)) for r in rows]
+            Backup.bulk_upsert(backups)
+
+        return Response({'count': len(backups)}, status=status.HTTP_201_CREATED)
@@ -0,0 +1,62 @@
+import zlib
+
+from django import forms
+from django.db import models
+
+
+class CompressedTextField(models.BinaryField):
+    """
+    A text field stored zlib compressed in a binary (`bytea`) column. Values are compressed when saved and
+    decompressed when loaded, so the field reads and writes `str` like a `TextField`. As the column is opaque to the
+    database it cannot be filtered on.
+    """
+    description = "Compressed text"
+    empty_values = [None, '', b'']
+
+    def __init__(self, *args, level: int = 6, **kwargs):
+        self.level = level
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def check(self, **kwargs):
+        # unlike a BinaryField, the default is text
+        return models.Field.check(self, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get('editable'):
+            del kwargs['editable']
+        else:
+            kwargs['editable'] = False
+        if self.level != 6:
+            kwargs['level'] = self.level
+        return name, path, args, kwargs
+
+    def compress(self, value: str):
+        return zlib.compress(value.encode('utf-8'), self.level)
+
+    @staticmethod
+    def decompress(value):
+        return zlib.decompress(value).decode('utf-8')
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if isinstance(value, str):
+            return self.compress(value)
+        return value
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return self.decompress(value)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return self.decompress(value)
+        return value
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{'form_class': forms.CharField, 'widget': forms.Textarea, **kwargs})
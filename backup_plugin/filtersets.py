@@ -1,6 +1,7 @@
 import logging
 
-from django.db.models import Q, Max
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Q, Max
 from django.utils.translation import gettext as _
 import django_filters
 
@@ -42,6 +43,9 @@ class BackupFilterSet(NetBoxModelFilterSet):
     process_date = django_filters.DateFilter(field_name='created__date', lookup_expr='exact')
 
     last_processed = django_filters.DateFilter(field_name='last_processed__date', lookup_expr='exact', required=False)
+    # a date range, inclusive, ex: last_processed_after=2025-07-01&last_processed_before=2025-07-31
+    last_processed_after = django_filters.DateFilter(field_name='last_processed__date', lookup_expr='gte')
+    last_processed_before = django_filters.DateFilter(field_name='last_processed__date', lookup_expr='lte')
 
     # process_date = django_filters.ChoiceFilter(choices=get_backup_process_date_choices)
     # Backup.objects.all().order_by('created__date').distinct('created__date').first().created.date()
@@ -59,14 +63,30 @@ class BackupFilterSet(NetBoxModelFilterSet):
 
     class Meta:
         model = Backup
-        fields = ('id', 'name', 'device', 'last_processed')
+        # the change statistics are filtered by range, ex: `lines_added__gte=100` (the lookups are added by NetBox)
+        fields = (
+            'id', 'name', 'device', 'last_processed', 'lines_added', 'lines_removed', 'hunk_count', 'section_count'
+        )
 
     def search(self, queryset, name, value):
-        return queryset.filter(
-            Q(name__icontains=value) | Q(device__name__icontains=value) |
-            Q(device__device_type__manufacturer__name__icontains=value) |
-            Q(device__device_type__model__icontains=value) |
-            Q(device__site__region__name__icontains=value) |
-            Q(diff__icontains=value)
+        if not value.strip():
+            return queryset
+
+        # the diff content is matched with the full text index over the changed lines (`Backup.search_vector`)
+        # rather than scanning the diff HTML; ex: `ip route` matches changed lines containing both words and
+        # `"ip route"` the phrase. Each lookup is a separate subquery of the union, so that the index is used (an
+        # OR with the name lookups would scan the table), and the devices are matched on their own (small) tables.
+        query = SearchQuery(value, config='simple', search_type='websearch')
+        devices = Device.objects.filter(
+            Q(name__icontains=value) | Q(device_type__manufacturer__name__icontains=value) |
+            Q(device_type__model__icontains=value) | Q(site__region__name__icontains=value)
+        )
+        matches = Backup.objects.filter(search_vector=query).values('pk').union(
+            Backup.objects.filter(name__icontains=value).values('pk'),
+            Backup.objects.filter(device__in=devices).values('pk'),
         )
+        # the rank orders the list (see `BackupTable.configure`) and the API (see `BackupCursorPagination`)
+        return queryset.filter(pk__in=matches).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-last_processed')
 
@@ -5,7 +5,7 @@ from netbox.forms import NetBoxModelForm, NetBoxModelFilterSetForm
 from utilities.forms.fields import CommentField, DynamicModelMultipleChoiceField
 
 from utilities.forms.widgets import DateTimePicker
-from .models import  Backup
+from .models import Backup, IngestRun
 from django import forms
 from django.utils.translation import gettext as _
 
@@ -26,14 +26,21 @@ class BackupForm(NetBoxModelForm):
 
 def get_backup_process_date_choices():
     """
-    Returns a list of distinct created date choices by ordering Backup records by created date. The idea is to
-    create a distinct list of dates for each daily backup.
+    Returns the dates of the daily backups, read from the `IngestRun` ledger (rather than scanning the backups),
+    the latest run first. The blank choice lists the backups of all dates.
 
     Returns:
         list(tuple): List of Choices (label and value)
     """
-    return [(o.last_processed.date(), o.last_processed.date()) for o in Backup.objects.all().order_by(
-        'last_processed__date').distinct('last_processed__date')]
+    dates = IngestRun.get_dates()
+    return [('', _('All dates'))] + [
+        (d, f"{d} (latest)" if i == 0 else d) for i, d in enumerate(dates)
+    ]
+
+
+def get_latest_process_date():
+    """the date of the latest ingest run that stored backups, or None"""
+    return next(iter(IngestRun.get_dates()), None)
 
 
 class BackupFilterForm(NetBoxModelFilterSetForm):
@@ -44,8 +51,9 @@ class BackupFilterForm(NetBoxModelFilterSetForm):
         required=False
     )
 
-    # this will render a list of the available daily backup days
-    last_processed = forms.ChoiceField(choices=get_backup_process_date_choices)
+    # this will render a list of the available daily backup days, the latest by default (see `BackupListView`)
+    last_processed = forms.ChoiceField(
+        choices=get_backup_process_date_choices, initial=get_latest_process_date, required=False)
 
     device_type = DynamicModelMultipleChoiceField(
         queryset=DeviceType.objects.all(),
@@ -58,3 +66,9 @@ class BackupFilterForm(NetBoxModelFilterSetForm):
         required=False,
         label=_('Region')
     )
+
+    # minimum size of the change, ex: to find the largest changes of a day
+    lines_added__gte = forms.IntegerField(min_value=0, required=False, label=_('Lines added (min)'))
+    lines_removed__gte = forms.IntegerField(min_value=0, required=False, label=_('Lines removed (min)'))
+    hunk_count__gte = forms.IntegerField(min_value=0, required=False, label=_('Hunks (min)'))
+    section_count__gte = forms.IntegerField(min_value=0, required=False, label=_('Changed sections (min)'))
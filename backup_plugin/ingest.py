@@ -0,0 +1,272 @@
+"""
+The daily processing of the Unimus backups (see `scripts/create_backup_entries.py` and `jobs.py`)
+
+`process()` runs a whole ingest in the calling process. The jobs in `jobs.py` split it instead: a coordinator lists
+the changed devices and enqueues chunks of them, each stored by `process_devices()` on any RQ worker and recorded by
+`record_chunk()`.
+"""
+import logging
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from dcim.models import Device
+from netbox.plugins import get_plugin_config
+
+from backup_plugin.utils import diff, diff2html, metrics, unimus
+from backup_plugin.models import Backup, Configuration, IngestRun, SyncState, UnimusDevice
+
+logger = logging.getLogger(f"netbox.plugins.{__name__}")
+
+# the `SyncState` checkpoint of the daily processing
+SYNC_STATE_NAME = 'unimus'
+
+
+def get_window():
+    """
+    Returns:
+        ((SyncState), (int), (int)): the checkpoint and the `since` and `until` of the next run: from the checkpoint
+            of the last successful run (the current day at midnight on the first run) to now, at most
+            `max_window_days` days
+    """
+    state, _ = SyncState.objects.get_or_create(name=SYNC_STATE_NAME)
+    since = state.watermark or int(datetime.combine(datetime.now(), time.min).timestamp())
+    until = int(timezone.now().timestamp())
+
+    # a device that keeps failing holds the checkpoint back; do not let the window grow without bound
+    earliest = until - int(unimus.config.get('max_window_days', 7) * 86400)
+    if since < earliest:
+        logger.warning(
+            f"the last successful run ended at {datetime.fromtimestamp(since, tz=dt_timezone.utc).isoformat()}, "
+            f"backups changed before {datetime.fromtimestamp(earliest, tz=dt_timezone.utc).isoformat()} are skipped"
+        )
+        since = earliest
+    return state, since, until
+
+
+def process():
+    """
+    Run a whole ingest: refresh the Unimus device index, then fetch, diff and store the backups of every device
+    changed since the last successful run. The run is recorded in the `IngestRun` ledger.
+
+    Returns:
+        (list): error messages
+    """
+    client = unimus.get_client()
+    started = timezone.now()
+
+    # refresh the local Unimus device -> NetBox device index
+    with metrics.timer('refresh_devices'):
+        UnimusDevice.refresh(client.iter_devices())
+
+    state, since, until = get_window()
+    # the `last_processed` of every backup stored by the run, so that they all fall on the date of the run
+    processed = timezone.now()
+    run = IngestRun.objects.create(
+        date=timezone.localdate(processed), since=since, until=until, started=started)
+
+    # walk the changed devices page by page; they are fetched and stored as they are listed
+    result = None
+    try:
+        result = process_devices(client.iter_changed_backups(since, until), since, processed=processed, client=client)
+    finally:
+        run.finish(result)
+
+    # only move the checkpoint forward when every device was fetched, otherwise the next run retries this window
+    # (the devices that did succeed are skipped then)
+    if not result['failed']:
+        state.watermark = until
+        state.save()
+
+    return result['errors']
+
+
+def record_chunk(run_id, result: dict = None, chunks: int = None):
+    """
+    Add the result of a chunk job to a sharded run (`result` is None when the chunk failed), or, with `chunks`, set
+    the number of chunk jobs once they are all enqueued. The call that finds every chunk done completes the run and
+    moves the checkpoint forward when every device was fetched.
+
+    Returns:
+        (IngestRun|None): the run, when this call completed it
+    """
+    with transaction.atomic():
+        run = IngestRun.objects.select_for_update().get(pk=run_id)
+        if chunks is not None:
+            run.chunks = chunks
+        else:
+            run.chunks_done += 1
+            if result is None:
+                run.failed_chunks += 1
+            else:
+                run.add(result)
+
+        completed = run.completed is None and run.chunks is not None and run.chunks_done >= run.chunks
+        if completed:
+            run.complete()
+            # otherwise the next run retries this window (the devices that did succeed are skipped then)
+            if not run.failed and not run.failed_chunks:
+                SyncState.objects.update_or_create(name=SYNC_STATE_NAME, defaults={'watermark': run.until})
+        run.save()
+
+    if completed:
+        logger.info(
+            f"ingest run {run.pk}: {run.devices} devices in {run.chunks} chunks, {run.stored} stored, "
+            f"{run.skipped} skipped, {run.failed} failed, {run.failed_chunks} failed chunks"
+        )
+        return run
+    return None
+
+
+def process_devices(devices, since: int, processed: datetime = None, client=None):
+    """
+    Fetch, diff and store the backups of changed devices. Devices whose latest backup pair is already stored are
+    skipped before their backups are decoded and diffed.
+
+    Each device is handled as it arrives and its backups are buffered; every `flush_size` devices the buffer is
+    written (its configurations and backups, in a single transaction of a few queries) and emptied, so memory holds
+    at most `flush_size` devices rather than all of them.
+
+    Args:
+        devices (iterable): device entries as returned by `devices/findByChangedBackup`
+        since (int): Unix Epoch start of the run (the pairs stored since are skipped)
+        processed (datetime|None): the `last_processed` of the stored backups, the time of the run (defaults to now)
+        client (Client|None): defaults to `unimus.get_client()`
+
+    Returns:
+        (dict): counts of `devices`, `stored`, `skipped` and `failed` (devices whose backups could not be fetched),
+            the `errors` messages and the seconds spent per phase (`timings`)
+    """
+    client = client or unimus.get_client()
+    # the time spent per phase is reported at the end (see `utils.metrics`)
+    started = metrics.totals()
+
+    # backup pairs already stored: a device that changed after `since` can only have been processed after `since`
+    known_pairs = set(Backup.objects.filter(
+        last_processed__gte=datetime.fromtimestamp(since, tz=dt_timezone.utc)
+    ).values_list('orig_id', 'rev_id'))
+
+    result = {'devices': 0, 'stored': 0, 'skipped': 0, 'failed': 0, 'errors': []}
+    errors = result['errors']
+    # the buffer: configurations by hash, backups and the Unimus device id of each backup name
+    configs = {}
+    backups = []
+    unimus_ids = {}
+    flush_size = unimus.config.get('flush_size', 50)
+    processed = processed or timezone.now()
+    renderer = get_plugin_config('backup_plugin', 'renderer', 'python')
+    # when disabled only the unified diff is stored and the table is rendered when the backup is first viewed
+    render_at_ingest = get_plugin_config('backup_plugin', 'render_at_ingest', True)
+
+    diffs = client.iter_backup_diffs(devices, skip=lambda orig_id, rev_id: (orig_id, rev_id) in known_pairs)
+    for k, v in diffs:
+        logger.debug("k: %s, %s, %s", k, v.keys(), v.get('backups'))
+        result['devices'] += 1
+        if v.get('error'):
+            # the fetch failed for this device only; report it and carry on with the rest
+            errors.append(f"{k} {v['error']}")
+            result['failed'] += 1
+            metrics.INGEST_DEVICES.labels('error').inc()
+            continue
+
+        if v.get('skipped'):
+            result['skipped'] += 1
+            metrics.INGEST_DEVICES.labels('skipped').inc()
+            continue
+
+        if len(v.get('backups') or []) < 2:
+            # nothing to diff; report it rather than aborting the batched write of the other devices
+            errors.append(f"{k} No backups found")
+            metrics.INGEST_DEVICES.labels('error').inc()
+            continue
+
+        _table = ''
+        if render_at_ingest:
+            # render the diff table in-process (or with the Node.js diff2html CLI when configured)
+            with metrics.timer('render'):
+                _table = diff2html.render_html(v.get('diff'), renderer=renderer)
+            if not _table:
+                errors.append(f"{k} No table found")
+                metrics.INGEST_DEVICES.labels('error').inc()
+                continue
+
+        # both configurations go to the content addressed store with the backups; keep only their metadata in
+        # diff_info
+        orig_config_id, rev_config_id = (
+            _buffer_config(configs, b.pop('config')) for b in v['backups'][:2])
+        result['stored'] += 1
+        metrics.INGEST_DEVICES.labels('stored').inc()
+
+        # create a record, the device is resolved below
+        unimus_ids[k] = v['id']
+        backups.append(Backup(
+            name=k, orig_id=v.get('backups')[0]['id'], rev_id=v.get('backups')[1]['id'],
+            orig_config_id=orig_config_id, rev_config_id=rev_config_id,
+            diff_info=v.get('backups'),
+            diff=_table,
+            unified_diff=v.get('diff') or '',
+            changes=diff.changed_lines(v.get('diff')),
+            last_processed=processed,
+            **diff.change_stats(v.get('diff'))
+        ))
+        if len(backups) >= flush_size:
+            flush(configs, backups, unimus_ids)
+
+    flush(configs, backups, unimus_ids)
+
+    # fetch, decode and diff run concurrently in the client's worker threads, so their sum can exceed the run time
+    result['timings'] = {
+        phase: seconds - started.get(phase, 0) for phase, seconds in sorted(metrics.totals().items())
+    }
+    logger.info("phase timings (s): %s", ', '.join(f"{k}={v:.3f}" for k, v in result['timings'].items()))
+
+    return result
+
+
+def _buffer_config(configs: dict, config: str):
+    """add a configuration to the buffer, returns its hash"""
+    config_hash = Configuration.get_hash(config)
+    configs.setdefault(config_hash, config)
+    return config_hash
+
+
+def flush(configs: dict, backups: list, unimus_ids: dict):
+    """
+    Write the buffered configurations and backups in a single transaction, then empty the buffer. Rewriting the same
+    backups updates them instead of adding duplicates.
+    """
+    if not backups:
+        return
+
+    with metrics.timer('resolve_devices'):
+        resolve_devices(backups, unimus_ids)
+
+    with metrics.timer('db_write'), transaction.atomic():
+        Configuration.lock()
+        Configuration.store(configs)
+        Backup.bulk_upsert(backups)
+
+    configs.clear()
+    backups.clear()
+    unimus_ids.clear()
+
+
+def resolve_devices(backups, unimus_ids):
+    """
+    Set the NetBox Device of each backup: from the Unimus device index, then by name (in a single `name__in` query)
+    for devices not matched by the index.
+
+    Args:
+        backups (list[Backup]): the backups
+        unimus_ids (dict): Unimus device id by backup name
+    """
+    device_ids = UnimusDevice.lookup(unimus_ids.values())
+
+    unmatched = {b.name for b in backups if not device_ids.get(unimus_ids.get(b.name))}
+    device_ids_by_name = {}
+    for name, pk in Device.objects.filter(name__in=unmatched).order_by('-pk').values_list('name', 'pk'):
+        device_ids_by_name[name] = pk
+
+    for backup in backups:
+        backup.device_id = device_ids.get(unimus_ids.get(backup.name)) or device_ids_by_name.get(backup.name)
@@ -0,0 +1,91 @@
+"""
+Background jobs splitting the daily processing across the RQ workers
+
+    1. `IngestCoordinatorJob` refreshes the Unimus device index, lists the devices changed since the last successful
+       run and enqueues them in chunks of `chunk_size` devices.
+    2. `IngestChunkJob` fetches, diffs and stores the backups of one chunk (see `ingest.process_devices`). Chunks are
+       picked up by any worker, on any host, so adding workers shortens the run.
+
+Each chunk adds its counts to the run's `IngestRun` (see `ingest.record_chunk`); the last one to finish completes the
+run and moves the checkpoint forward when every device was fetched. The errors of each chunk are in its job data. A
+run whose chunk job never finished (ex: its worker was killed) is left incomplete, and the next run retries its window.
+
+`RetentionJob` removes the backups past the retention policy (see `retention`).
+
+Configuration (optional):
+    PLUGINS_CONFIG = {
+        'backup_plugin': {
+            'unimus': {
+                'chunk_size': 100,          # devices per chunk job
+            }
+        }
+    }
+"""
+import logging
+from itertools import islice
+
+from django.utils import timezone
+
+from netbox.jobs import JobRunner
+
+from backup_plugin import ingest, retention
+from backup_plugin.models import IngestRun, UnimusDevice
+from backup_plugin.utils import metrics, unimus
+
+logger = logging.getLogger(f"netbox.plugins.{__name__}")
+
+
+class IngestCoordinatorJob(JobRunner):
+    class Meta:
+        name = "Backup ingest"
+
+    def run(self, *args, **kwargs):
+        client = unimus.get_client()
+        chunk_size = unimus.config.get('chunk_size', 100)
+        started = timezone.now()
+
+        # refresh the local Unimus device -> NetBox device index once, before any chunk resolves its devices
+        with metrics.timer('refresh_devices'):
+            UnimusDevice.refresh(client.iter_devices())
+
+        _, since, until = ingest.get_window()
+        # the `last_processed` of the backups stored by every chunk, so that they all fall on the date of the run
+        processed = timezone.now()
+        # completed by the last chunk job to finish
+        run = IngestRun.objects.create(
+            date=timezone.localdate(processed), since=since, until=until, started=started)
+
+        # enqueue the chunks as the listing is walked, page by page
+        chunks = 0
+        devices = client.iter_changed_backups(since, until)
+        while chunk := list(islice(devices, chunk_size)):
+            IngestChunkJob.enqueue(
+                run_id=run.pk, devices=chunk, since=since, processed=processed, user=self.job.user)
+            chunks += 1
+
+        # completes the run now when there was nothing to enqueue, or every chunk already finished
+        ingest.record_chunk(run.pk, chunks=chunks)
+        self.job.data = {'since': since, 'until': until, 'chunks': chunks, 'run': run.pk}
+        logger.info(f"enqueued {chunks} chunks of up to {chunk_size} devices ({since} - {until})")
+
+
+class IngestChunkJob(JobRunner):
+    class Meta:
+        name = "Backup ingest chunk"
+
+    def run(self, run_id, devices, since, processed=None, *args, **kwargs):
+        result = None
+        try:
+            result = ingest.process_devices(devices, since, processed=processed)
+            self.job.data = result
+        finally:
+            # recorded as a failed chunk when processing raised
+            ingest.record_chunk(run_id, result)
+
+
+class RetentionJob(JobRunner):
+    class Meta:
+        name = "Backup retention"
+
+    def run(self, *args, **kwargs):
+        self.job.data = retention.prune()
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup_plugin', '0002_backup_diff_info'),
+        ('dcim', '0200_populate_mac_addresses'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='backup',
+            options={'ordering': ['last_processed']},
+        ),
+        migrations.AlterField(
+            model_name='backup',
+            name='diff_info',
+            field=models.JSONField(blank=True, default=list, null=True, verbose_name='Diff Info'),
+        ),
+        migrations.CreateModel(
+            name='UnimusDevice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('unimus_id', models.PositiveIntegerField(unique=True)),
+                ('name', models.CharField(db_index=True, max_length=255)),
+                ('address', models.CharField(blank=True, max_length=255)),
+                ('last_synced', models.DateTimeField()),
+                ('device', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dcim.device')),
+            ],
+            options={
+                'verbose_name': 'Unimus device',
+                'ordering': ['name'],
+            },
+        ),
+    ]
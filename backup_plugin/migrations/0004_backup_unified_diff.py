@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup_plugin', '0003_unimusdevice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backup',
+            name='unified_diff',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:41
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Keep only the most recent row of each (name, orig_id, rev_id) so the unique constraint can be added.
+    """
+    Backup = apps.get_model('backup_plugin', 'Backup')
+
+    duplicates = Backup.objects.values('name', 'orig_id', 'rev_id').annotate(
+        max_id=Max('id'), count=Count('id')
+    ).filter(count__gt=1).order_by()
+
+    for duplicate in duplicates.iterator():
+        Backup.objects.filter(
+            name=duplicate['name'], orig_id=duplicate['orig_id'], rev_id=duplicate['rev_id']
+        ).exclude(id=duplicate['max_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup_plugin', '0004_backup_unified_diff'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='backup',
+            constraint=models.UniqueConstraint(fields=('name', 'orig_id', 'rev_id'), name='backup_plugin_backup_unique_name_orig_id_rev_id'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:02
+
+import html
+import re
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+# the changed lines of a diff2html table (as stored in `Backup.diff` before `unified_diff` existed)
+CHANGED_LINE = re.compile(
+    r'<td class="d2h-(?:ins|del)[^"]*">\s*<div class="d2h-code-line[^"]*">.*?'
+    r'<span class="d2h-code-line-ctn">(.*?)</span>',
+    re.DOTALL
+)
+TAG = re.compile(r'<[^>]+>')
+
+
+def changed_lines(backup):
+    if backup.unified_diff:
+        lines = []
+        in_hunk = False
+        for line in backup.unified_diff.splitlines():
+            if line.startswith('@@'):
+                in_hunk = True
+            elif in_hunk and line[:1] in ('+', '-'):
+                lines.append(line[1:])
+        return '\n'.join(lines)
+
+    return '\n'.join(html.unescape(TAG.sub('', m)) for m in CHANGED_LINE.findall(backup.diff or ''))
+
+
+def populate_changes(apps, schema_editor):
+    """
+    Extract the changed lines of the existing backups, in chunks.
+    """
+    Backup = apps.get_model('backup_plugin', 'Backup')
+
+    last_pk = 0
+    while True:
+        backups = list(
+            Backup.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'diff', 'unified_diff')[:500]
+        )
+        if not backups:
+            break
+        for backup in backups:
+            backup.changes = changed_lines(backup)
+        Backup.objects.bulk_update(backups, ['changes'])
+        last_pk = backups[-1].pk
+
+
+class Migration(migrations.Migration):
+    # commit each chunk of the data migration separately
+    atomic = False
+
+    dependencies = [
+        ('backup_plugin', '0006_syncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backup',
+            name='changes',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(populate_changes, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='backup',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('changes', config='simple'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='backup',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='backup_plugin_backup_search'),
+        ),
+    ]
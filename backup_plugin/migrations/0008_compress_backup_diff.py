@@ -0,0 +1,80 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:47
+
+import zlib
+
+from django.db import migrations
+
+import backup_plugin.fields
+
+CHUNK_SIZE = 500
+
+
+def compress_diffs(apps, schema_editor):
+    """
+    Copy the diff columns into their compressed counterparts in chunks, and report the size reduction.
+    """
+    Backup = apps.get_model('backup_plugin', 'Backup')
+
+    size = compressed_size = 0
+    last_pk = 0
+    while True:
+        backups = list(
+            Backup.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'diff', 'unified_diff')[:CHUNK_SIZE]
+        )
+        if not backups:
+            break
+        for backup in backups:
+            # assign the compressed bytes directly (the field passes bytes through) so they can be measured
+            backup.diff_compressed = zlib.compress((backup.diff or '').encode('utf-8'))
+            backup.unified_diff_compressed = zlib.compress((backup.unified_diff or '').encode('utf-8'))
+            size += len((backup.diff or '').encode('utf-8')) + len((backup.unified_diff or '').encode('utf-8'))
+            compressed_size += len(backup.diff_compressed) + len(backup.unified_diff_compressed)
+        Backup.objects.bulk_update(backups, ['diff_compressed', 'unified_diff_compressed'])
+        last_pk = backups[-1].pk
+
+    if size:
+        print(
+            f"\n  Compressed backup diffs: {size:,} bytes -> {compressed_size:,} bytes "
+            f"({100 - compressed_size * 100 / size:.1f}% smaller)"
+        )
+
+
+class Migration(migrations.Migration):
+    # commit each chunk of the data migration separately
+    atomic = False
+
+    dependencies = [
+        ('backup_plugin', '0007_backup_changes_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backup',
+            name='diff_compressed',
+            field=backup_plugin.fields.CompressedTextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='backup',
+            name='unified_diff_compressed',
+            field=backup_plugin.fields.CompressedTextField(blank=True, default=''),
+        ),
+        migrations.RunPython(compress_diffs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='backup',
+            name='diff',
+        ),
+        migrations.RemoveField(
+            model_name='backup',
+            name='unified_diff',
+        ),
+        migrations.RenameField(
+            model_name='backup',
+            old_name='diff_compressed',
+            new_name='diff',
+        ),
+        migrations.RenameField(
+            model_name='backup',
+            old_name='unified_diff_compressed',
+            new_name='unified_diff',
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:30
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import backup_plugin.fields
+
+CHUNK_SIZE = 200
+
+
+def move_configs(apps, schema_editor):
+    """
+    Move the configurations embedded in `Backup.diff_info` into the content addressed store, in chunks.
+    """
+    Backup = apps.get_model('backup_plugin', 'Backup')
+    Configuration = apps.get_model('backup_plugin', 'Configuration')
+
+    last_pk = 0
+    while True:
+        backups = list(
+            Backup.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'diff_info')[:CHUNK_SIZE]
+        )
+        if not backups:
+            break
+        last_pk = backups[-1].pk
+
+        configs = {}
+        changed = []
+        for backup in backups:
+            info = backup.diff_info if isinstance(backup.diff_info, list) else []
+            if len(info) < 2 or not all(isinstance(i, dict) and 'config' in i for i in info[:2]):
+                continue
+
+            hashes = []
+            for i in info[:2]:
+                config = i.pop('config') or ''
+                config_hash = hashlib.sha256(config.encode('utf-8')).hexdigest()
+                configs.setdefault(config_hash, config)
+                hashes.append(config_hash)
+            backup.orig_config_id, backup.rev_config_id = hashes
+            changed.append(backup)
+
+        existing = set(Configuration.objects.filter(hash__in=configs.keys()).values_list('hash', flat=True))
+        Configuration.objects.bulk_create([
+            Configuration(hash=config_hash, data=config, size=len(config.encode('utf-8')))
+            for config_hash, config in configs.items() if config_hash not in existing
+        ], ignore_conflicts=True)
+        Backup.objects.bulk_update(changed, ['orig_config', 'rev_config', 'diff_info'])
+
+
+class Migration(migrations.Migration):
+    # commit each chunk of the data migration separately
+    atomic = False
+
+    dependencies = [
+        ('backup_plugin', '0008_compress_backup_diff'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Configuration',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', backup_plugin.fields.CompressedTextField()),
+                ('size', models.PositiveIntegerField(help_text='Uncompressed size in bytes')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['created'],
+            },
+        ),
+        migrations.AddField(
+            model_name='backup',
+            name='orig_config',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='backup_plugin.configuration'),
+        ),
+        migrations.AddField(
+            model_name='backup',
+            name='rev_config',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='backup_plugin.configuration'),
+        ),
+        migrations.RunPython(move_configs, migrations.RunPython.noop),
+    ]
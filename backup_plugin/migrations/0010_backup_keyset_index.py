@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:10
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup_plugin', '0009_configuration'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='backup',
+            index=models.Index(
+                django.db.models.expressions.OrderBy(
+                    django.db.models.expressions.F('last_processed'), nulls_first=True
+                ),
+                'id',
+                name='backup_plugin_backup_keyset'
+            ),
+        ),
+    ]
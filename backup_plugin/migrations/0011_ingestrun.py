@@ -0,0 +1,53 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:40
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def backfill_runs(apps, schema_editor):
+    """
+    Record one run per processing date of the existing backups, so that the filter form keeps offering them.
+    """
+    Backup = apps.get_model('backup_plugin', 'Backup')
+    IngestRun = apps.get_model('backup_plugin', 'IngestRun')
+
+    IngestRun.objects.bulk_create([
+        IngestRun(
+            date=row['last_processed__date'], started=row['started'], completed=row['completed'],
+            devices=row['count'], stored=row['count']
+        )
+        for row in Backup.objects.filter(last_processed__isnull=False).order_by().values(
+            'last_processed__date'
+        ).annotate(count=Count('id'), started=Min('last_processed'), completed=Max('last_processed'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup_plugin', '0010_backup_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('date', models.DateField(db_index=True)),
+                ('since', models.PositiveBigIntegerField(blank=True, help_text='Unix Epoch start of the window', null=True)),
+                ('until', models.PositiveBigIntegerField(blank=True, help_text='Unix Epoch end of the window', null=True)),
+                ('started', models.DateTimeField()),
+                ('completed', models.DateTimeField(blank=True, null=True)),
+                ('devices', models.PositiveIntegerField(default=0, help_text='Changed devices')),
+                ('stored', models.PositiveIntegerField(default=0, help_text='Backups stored')),
+                ('skipped', models.PositiveIntegerField(default=0, help_text='Devices whose latest backups were already stored')),
+                ('failed', models.PositiveIntegerField(default=0, help_text='Devices whose backups could not be fetched')),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('duration', models.FloatField(blank=True, help_text='Seconds', null=True)),
+            ],
+            options={
+                'ordering': ['-started'],
+            },
+        ),
+        migrations.RunPython(backfill_runs, migrations.RunPython.noop),
+    ]
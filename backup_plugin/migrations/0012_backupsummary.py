@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup_plugin', '0011_ingestrun'),
+        ('dcim', '0200_populate_mac_addresses'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('name', models.CharField(max_length=100)),
+                ('backups', models.PositiveIntegerField(default=0)),
+                ('device', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dcim.device')),
+            ],
+            options={
+                'verbose_name_plural': 'backup summaries',
+                'ordering': ['-date', 'name'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'name'), name='backup_plugin_backupsummary_unique_date_name')],
+            },
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:10
+
+import re
+
+from django.db import migrations, models
+
+CHUNK_SIZE = 500
+STATS_FIELDS = ('lines_added', 'lines_removed', 'hunk_count', 'section_count')
+HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+def change_stats(diff: str):
+    """the lines added and removed, hunks and changed sections of a unified diff (see `utils.diff.change_stats`)"""
+    stats = {'lines_added': 0, 'lines_removed': 0, 'hunk_count': 0, 'section_count': 0}
+    sections = set()
+    # sections are keyed by the line number of their top level line in the newer configuration
+    section = None
+    line_no = 0
+    for line in (diff or '').splitlines():
+        match = HUNK_HEADER.match(line) if line.startswith('@@') else None
+        if match:
+            stats['hunk_count'] += 1
+            line_no = int(match.group(3))
+            # the section of the lines before the first top level line of the hunk
+            section = ('hunk', stats['hunk_count'])
+            continue
+        if not stats['hunk_count'] or line.startswith('\\'):
+            # file headers, and "\ No newline at end of file"
+            continue
+
+        content = line[1:]
+        stripped = content.strip()
+        is_config = bool(stripped) and stripped[0] not in '!#'
+        if is_config and not content[0].isspace():
+            section = line_no
+        if line[:1] != '-':
+            line_no += 1
+        if line[:1] not in ('+', '-'):
+            continue
+
+        stats['lines_added' if line[0] == '+' else 'lines_removed'] += 1
+        if is_config:
+            sections.add(section)
+
+    stats['section_count'] = len(sections)
+    return stats
+
+
+def populate_stats(apps, schema_editor):
+    """
+    Measure the unified diff of the existing backups, in chunks. Backups stored before `unified_diff` existed keep
+    zeros.
+    """
+    Backup = apps.get_model('backup_plugin', 'Backup')
+
+    last_pk = 0
+    while True:
+        backups = list(
+            Backup.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'unified_diff')[:CHUNK_SIZE]
+        )
+        if not backups:
+            break
+        for backup in backups:
+            for name, value in change_stats(backup.unified_diff).items():
+                setattr(backup, name, value)
+        Backup.objects.bulk_update(backups, STATS_FIELDS)
+        last_pk = backups[-1].pk
+
+
+class Migration(migrations.Migration):
+    # commit each chunk of the data migration separately
+    atomic = False
+
+    dependencies = [
+        ('backup_plugin', '0012_backupsummary'),
+    ]
+
+    # the columns are indexed once populated
+    operations = [
+        migrations.AddField(
+            model_name='backup',
+            name='lines_added',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='backup',
+            name='lines_removed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='backup',
+            name='hunk_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Hunks'),
+        ),
+        migrations.AddField(
+            model_name='backup',
+            name='section_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Changed sections'),
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='backup',
+            name='lines_added',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AlterField(
+            model_name='backup',
+            name='lines_removed',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AlterField(
+            model_name='backup',
+            name='hunk_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='Hunks'),
+        ),
+        migrations.AlterField(
+            model_name='backup',
+            name='section_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='Changed sections'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backup_plugin', '0013_backup_change_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestrun',
+            name='chunks',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingestrun',
+            name='chunks_done',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ingestrun',
+            name='failed_chunks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
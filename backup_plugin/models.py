@@ -1,17 +1,27 @@
+import hashlib
 import json
 import logging
 from functools import cached_property
 
 from django.contrib.contenttypes.fields import GenericForeignKey
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connection, models, transaction
 from django.db.models import Q
 from django.urls import reverse
 from django.utils import timezone
 from dcim.models import Device, Site
 from netbox.models import NetBoxModel
+from netbox.plugins import get_plugin_config
+
+from backup_plugin.fields import CompressedTextField
+from backup_plugin.utils import cache, diff
 
 logger = logging.getLogger(f"netbox.backup_plugin.{__name__}")
 
+# the PostgreSQL advisory lock of the configuration store (see `Configuration.lock`)
+CONFIGURATION_LOCK_ID = 0x6270636f
+
 
 class Backup(NetBoxModel):
     name = models.CharField(max_length=100)
@@ -23,9 +33,36 @@ class Backup(NetBoxModel):
     )
     orig_id = models.PositiveIntegerField()
     rev_id = models.PositiveIntegerField()
+    # the configurations of the `orig_id` and `rev_id` backups, see `Configuration`
+    orig_config = models.ForeignKey(
+        to='backup_plugin.Configuration', on_delete=models.PROTECT,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    rev_config = models.ForeignKey(
+        to='backup_plugin.Configuration', on_delete=models.PROTECT,
+        related_name='+',
+        blank=True,
+        null=True
+    )
     diff_info = models.JSONField(blank=True, null=True, verbose_name="Diff Info", default=list)
-    diff = models.TextField(blank=True)
+    # the diff payloads are stored compressed; list querysets should `defer()` them
+    diff = CompressedTextField(blank=True, default='')
+    unified_diff = CompressedTextField(blank=True, default='')
+    # plain text of the changed lines (see `utils.diff.changed_lines`), indexed for searching by `search_vector`
+    changes = models.TextField(blank=True)
+    search_vector = models.GeneratedField(
+        expression=SearchVector('changes', config='simple'),
+        output_field=SearchVectorField(),
+        db_persist=True
+    )
     last_processed = models.DateTimeField(blank=True, null=True)
+    # size of the change, measured once from the unified diff (see `utils.diff.change_stats`)
+    lines_added = models.PositiveIntegerField(default=0, db_index=True)
+    lines_removed = models.PositiveIntegerField(default=0, db_index=True)
+    hunk_count = models.PositiveIntegerField(default=0, db_index=True, verbose_name='Hunks')
+    section_count = models.PositiveIntegerField(default=0, db_index=True, verbose_name='Changed sections')
 
     @property
     def process_date(self):
@@ -35,22 +72,51 @@ class Backup(NetBoxModel):
     # def diff_info_data(self):
     #     return json.loads(self.diff_info)
 
+    @property
+    def diff_html(self):
+        """
+        The rendered diff table. Rows ingested without a rendered table (see the `render_at_ingest` setting) are
+        rendered from `unified_diff` on first view and memoized in the cache by their backup pair.
+        """
+        if self.diff or not self.unified_diff:
+            return self.diff
+
+        return cache.get_diff_html(self.orig_id, self.rev_id, self.unified_diff)
+
+    def recompute_diff(self):
+        """
+        Recompute the unified diff of this backup from the locally stored configurations (no call to Unimus).
+
+        Returns:
+            (str|None): the unified diff, or None when the configurations are not stored
+        """
+        if not (self.orig_config_id and self.rev_config_id):
+            return None
+
+        # `orig_id` is the newest backup and `rev_id` the prior one (see `create_backup_entries`)
+        return diff.unified_diff(
+            self.rev_config.data, self.orig_config.data, fromfile=str(self.rev_id), tofile=str(self.orig_id),
+            engine=get_plugin_config('backup_plugin', 'diff_engine', 'histogram')
+        )
+
     @cached_property
     def attributes(self):
-        logger.info(f"device: {self.device}, {type(self.device)}")
+        logger.debug("device: %s, %s", self.device, type(self.device))
         info = []
         if not self.device:
             return ''
 
-        if self.device.tags.names():
-            info.append("Tags: " + ", ".join([t.name for t in self.device.tags.all()]))
+        # use `tags.all()` (rather than `tags.names()`) so prefetched tags are used
+        tags = [t.name for t in self.device.tags.all()]
+        if tags:
+            info.append("Tags: " + ", ".join(tags))
         info.append(f"Status: {getattr(self.device, 'status', None)}")
 
         if self.device.custom_field_data.get('poller'):
             info.append(f"Poller: {self.device.custom_field_data.get('poller')}")
         if self.device.primary_ip4:
             info.append(f"Primary IP4: {str(self.device.primary_ip4)}")
-        info.append(f"Region: {self.device.site.region.name}")
+        info.append(f"Region: {getattr(self.device.site.region, 'name', None)}")
 
         if self.device.serial:
             info.append(f"Serial: {self.device.serial}")
@@ -65,9 +131,281 @@ class Backup(NetBoxModel):
 
     class Meta:
         ordering = ['last_processed']
+        indexes = (
+            GinIndex(fields=['search_vector'], name='backup_plugin_backup_search'),
+            # keyset pagination of the REST API (see `api.pagination.BackupCursorPagination`)
+            models.Index(
+                models.F('last_processed').asc(nulls_first=True), 'id', name='backup_plugin_backup_keyset'
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'orig_id', 'rev_id'),
+                name='%(app_label)s_%(class)s_unique_name_orig_id_rev_id'
+            ),
+        )
 
     def get_absolute_url(self):
         return reverse('plugins:backup_plugin:backup', args=[self.pk])
 
     def __str__(self):
         return self.name
+
+    @classmethod
+    def bulk_upsert(cls, backups, batch_size: int = 500):
+        """
+        Insert backups in batches, in a single transaction. A backup that already exists for the same
+        `(name, orig_id, rev_id)` is updated instead, so re-running the daily processing does not create duplicates.
+
+        Note that, as with any bulk operation, no change log records are created.
+
+        Args:
+            backups (list[Backup]): Unsaved backups
+            batch_size (int): Number of rows written per query
+
+        Returns:
+            (list[Backup]): the backups
+        """
+        with transaction.atomic():
+            return cls.objects.bulk_create(
+                backups, batch_size=batch_size,
+                update_conflicts=True, unique_fields=['name', 'orig_id', 'rev_id'],
+                update_fields=[
+                    'device', 'orig_config', 'rev_config', 'diff_info', 'diff', 'unified_diff', 'changes',
+                    'lines_added', 'lines_removed', 'hunk_count', 'section_count', 'last_processed', 'last_updated'
+                ]
+            )
+
+
+class Configuration(models.Model):
+    """
+    Content addressed store of device configurations: each unique configuration is stored once (compressed), keyed
+    by the SHA-256 of its content, and referenced by the backups it belongs to.
+    """
+    hash = models.CharField(max_length=64, primary_key=True)
+    data = CompressedTextField()
+    size = models.PositiveIntegerField(help_text='Uncompressed size in bytes')
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created']
+
+    def __str__(self):
+        return self.hash
+
+    @classmethod
+    def lock(cls, shared: bool = True):
+        """
+        Take the configuration store lock until the end of the current transaction: shared by the writers of backups
+        (which may reference configurations no backup referenced so far), exclusive for removing the unreferenced
+        configurations (see `retention.prune_configurations`).
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT pg_advisory_xact_lock{'_shared' if shared else ''}(%s)", [CONFIGURATION_LOCK_ID])
+
+    @staticmethod
+    def get_hash(config: str):
+        return hashlib.sha256(config.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def store(cls, configs: dict, batch_size: int = 100):
+        """
+        Store configurations in a single `INSERT` per batch. The content of a hash never changes, so the
+        configurations already stored (or inserted concurrently) are left as they are.
+
+        Args:
+            configs (dict): configurations by hash (see `get_hash`)
+            batch_size (int): Number of rows written per query
+        """
+        cls.objects.bulk_create([
+            cls(hash=config_hash, data=config, size=len(config.encode('utf-8')))
+            for config_hash, config in configs.items()
+        ], batch_size=batch_size, ignore_conflicts=True)
+
+
+class UnimusDevice(models.Model):
+    """
+    Local index of Unimus devices and the NetBox Device each maps to (matched by the Unimus description). It is
+    bulk-refreshed from Unimus so that neither the Device tab nor the daily processing has to search Unimus or
+    NetBox by name.
+    """
+    unimus_id = models.PositiveIntegerField(unique=True)
+    name = models.CharField(max_length=255, db_index=True)
+    address = models.CharField(max_length=255, blank=True)
+    device = models.ForeignKey(
+        to='dcim.Device', on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    last_synced = models.DateTimeField()
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Unimus device'
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def info(self):
+        """the subset of the Unimus device info used by this plugin"""
+        return {'id': self.unimus_id, 'description': self.name, 'address': self.address}
+
+    @classmethod
+    def refresh(cls, devices, batch_size: int = 500):
+        """
+        Upsert the index from a list of Unimus devices and remove devices no longer known to Unimus. Devices are only
+        removed once the whole list was read and was not empty, so a listing that fails or comes back empty (ex:
+        during a Unimus outage) does not wipe the index.
+
+        Args:
+            devices (iterable): Unimus devices, ex: `Client.iter_devices()`
+            batch_size (int): Number of devices written per query
+
+        Returns:
+            (int): number of devices indexed
+        """
+        now = timezone.now()
+        count = 0
+        batch = []
+
+        def _flush():
+            # resolve the NetBox devices of the whole batch in a single query (first match wins, as before)
+            device_ids = {}
+            for name, pk in Device.objects.filter(
+                    name__in={d['description'] for d in batch if d.get('description')}
+            ).order_by('-pk').values_list('name', 'pk'):
+                device_ids[name] = pk
+
+            cls.objects.bulk_create([
+                cls(
+                    unimus_id=d['id'], name=d.get('description') or '', address=d.get('address') or '',
+                    device_id=device_ids.get(d.get('description')), last_synced=now
+                ) for d in batch
+            ], update_conflicts=True, unique_fields=['unimus_id'],
+                update_fields=['name', 'address', 'device', 'last_synced'])
+
+        for device in devices:
+            batch.append(device)
+            if len(batch) >= batch_size:
+                _flush()
+                count += len(batch)
+                batch = []
+        if batch:
+            _flush()
+            count += len(batch)
+
+        # reached only when the listing did not raise
+        if not count:
+            logger.warning("Unimus listed no devices, the device index is kept as is")
+            return count
+        cls.objects.filter(last_synced__lt=now).delete()
+        return count
+
+    @classmethod
+    def lookup(cls, unimus_ids):
+        """
+        Returns:
+            (dict): NetBox device id by Unimus device id for the given Unimus device ids (`None` when unmatched)
+        """
+        return dict(cls.objects.filter(unimus_id__in=unimus_ids).values_list('unimus_id', 'device_id'))
+
+
+class SyncState(models.Model):
+    """
+    Checkpoint of the daily processing: `watermark` is the `until` (Unix Epoch) of the last run that completed
+    without errors, and is used as the `since` of the next run.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    watermark = models.PositiveBigIntegerField(blank=True, null=True)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class IngestRun(models.Model):
+    """
+    Ledger of the daily processing runs: the window, counts and duration of each run. It is also the (small, indexed)
+    source of the processing dates offered by the backup filter form.
+    """
+    # the date of the `last_processed` of the backups stored by the run
+    date = models.DateField(db_index=True)
+    since = models.PositiveBigIntegerField(blank=True, null=True, help_text='Unix Epoch start of the window')
+    until = models.PositiveBigIntegerField(blank=True, null=True, help_text='Unix Epoch end of the window')
+    started = models.DateTimeField()
+    completed = models.DateTimeField(blank=True, null=True)
+    devices = models.PositiveIntegerField(default=0, help_text='Changed devices')
+    stored = models.PositiveIntegerField(default=0, help_text='Backups stored')
+    skipped = models.PositiveIntegerField(default=0, help_text='Devices whose latest backups were already stored')
+    failed = models.PositiveIntegerField(default=0, help_text='Devices whose backups could not be fetched')
+    errors = models.PositiveIntegerField(default=0)
+    duration = models.FloatField(blank=True, null=True, help_text='Seconds')
+    # sharded runs (see `jobs`): the chunk jobs enqueued (set once they all are), finished and failed
+    chunks = models.PositiveIntegerField(blank=True, null=True)
+    chunks_done = models.PositiveIntegerField(default=0)
+    failed_chunks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started']
+
+    def __str__(self):
+        return f"{self.date} ({self.started:%H:%M:%S})"
+
+    @classmethod
+    def get_dates(cls):
+        """
+        Returns:
+            (list[date]): the dates of the runs that stored backups, newest first
+        """
+        return list(cls.objects.filter(stored__gt=0).order_by('-date').values_list('date', flat=True).distinct())
+
+    def add(self, result: dict):
+        """add the counts of `ingest.process_devices()`"""
+        for key in ('devices', 'stored', 'skipped', 'failed'):
+            setattr(self, key, getattr(self, key) + result.get(key, 0))
+        self.errors += len(result.get('errors') or [])
+
+    def complete(self):
+        self.completed = timezone.now()
+        self.duration = (self.completed - self.started).total_seconds()
+
+    def finish(self, result: dict = None):
+        """record the counts of `ingest.process_devices()` (None when it raised: an error) and the duration"""
+        if result is None:
+            self.errors += 1
+        else:
+            self.add(result)
+        self.complete()
+        self.save()
+
+
+class BackupSummary(models.Model):
+    """
+    What remains of the backups removed by the retention policy (see `retention.prune`): the number of backups of a
+    device per processing date.
+    """
+    date = models.DateField()
+    name = models.CharField(max_length=100)
+    device = models.ForeignKey(
+        to='dcim.Device', on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    backups = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date', 'name']
+        verbose_name_plural = 'backup summaries'
+        constraints = (
+            models.UniqueConstraint(fields=('date', 'name'), name='%(app_label)s_%(class)s_unique_date_name'),
+        )
+
+    def __str__(self):
+        return f"{self.name} ({self.date})"
@@ -3,6 +3,14 @@ from netbox.plugins import PluginMenuItem, PluginMenuButton
 menu_items = (
     PluginMenuItem(
         link='plugins:backup_plugin:backup_list',
-        link_text='Device Backups'
+        link_text='Device Backups',
+        buttons=(
+            PluginMenuButton(
+                link='plugins:backup_plugin:backup_export',
+                title='Export (NDJSON)',
+                icon_class='mdi mdi-download',
+                permissions=['backup_plugin.view_backup'],
+            ),
+        )
     ),
 )
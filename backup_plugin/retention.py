@@ -0,0 +1,183 @@
+"""
+Retention of the backup history (see `jobs.RetentionJob` and `scripts/prune_backups.py`)
+
+Backups past the retention policy are removed in batches of `batch_size`, one short transaction each, with their
+tags and journal entries. The diff columns are not loaded, and as the job runs outside of a request no change log
+records are created. The configurations no longer referenced by any backup are removed afterwards, in batches too.
+
+Configuration (`days` and/or `keep_last` enable it):
+    PLUGINS_CONFIG = {
+        'backup_plugin': {
+            'retention': {
+                'days': 365,            # remove the backups processed more than `days` days ago
+                'keep_last': 10,        # but always keep the `keep_last` latest backups of each device
+                'batch_size': 1000,     # backups (and configurations) removed per transaction
+                'summarize': True,      # keep the number of removed backups per device and date (`BackupSummary`)
+            }
+        }
+    }
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Window
+from django.db.models.functions import Coalesce, RowNumber, TruncDate
+from django.utils import timezone
+
+from netbox.plugins import get_plugin_config
+
+from backup_plugin.models import Backup, BackupSummary, Configuration, IngestRun
+
+logger = logging.getLogger(f"netbox.plugins.{__name__}")
+
+# the columns of a backup not needed to delete it
+DEFERRED_FIELDS = ('diff', 'unified_diff', 'diff_info', 'changes', 'search_vector')
+
+
+def get_config():
+    return get_plugin_config('backup_plugin', 'retention') or {}
+
+
+def get_expired(days: int = None, keep_last: int = None):
+    """
+    Args:
+        days (int|None): backups processed more than `days` days ago are expired
+        keep_last (int|None): the `keep_last` latest backups of each device are never expired (when `days` is not
+            set, all the others are)
+
+    Returns:
+        (QuerySet): the ids of the expired backups, in order
+    """
+    processed = Coalesce('last_processed', 'created')
+    expired = Backup.objects.all()
+    if keep_last:
+        ranked = Backup.objects.annotate(rank=Window(
+            RowNumber(), partition_by=F('name'), order_by=[processed.desc(nulls_last=True), F('pk').desc()]
+        ))
+        expired = expired.filter(pk__in=ranked.filter(rank__gt=keep_last).values('pk'))
+    if days:
+        expired = expired.annotate(processed=processed).filter(
+            processed__lt=timezone.now() - timedelta(days=days))
+    return expired.order_by('pk').values_list('pk', flat=True)
+
+
+def prune(days: int = None, keep_last: int = None, batch_size: int = None, summarize: bool = None):
+    """
+    Remove the backups past the retention policy, then the configurations they leave unreferenced. The arguments
+    default to the `retention` settings.
+
+    Returns:
+        (dict): counts of removed `backups`, `configurations` and `runs` (of the `IngestRun` ledger) and of `batches`
+    """
+    config = get_config()
+    days = days if days is not None else config.get('days')
+    keep_last = keep_last if keep_last is not None else config.get('keep_last')
+    batch_size = batch_size or config.get('batch_size', 1000)
+    summarize = summarize if summarize is not None else config.get('summarize', True)
+
+    result = {'backups': 0, 'configurations': 0, 'runs': 0, 'batches': 0}
+    if not days and not keep_last:
+        logger.info("no retention policy configured, nothing to prune")
+        return result
+
+    # the ids are read once (through a server-side cursor) and removed a batch at a time
+    batch = []
+    for pk in get_expired(days, keep_last).iterator(chunk_size=batch_size):
+        batch.append(pk)
+        if len(batch) >= batch_size:
+            result['backups'] += delete_backups(batch, summarize=summarize)
+            result['batches'] += 1
+            batch = []
+    if batch:
+        result['backups'] += delete_backups(batch, summarize=summarize)
+        result['batches'] += 1
+
+    if days:
+        # the processing dates offered by the filter form are read from the ledger
+        result['runs'] = IngestRun.objects.filter(
+            date__lt=timezone.localdate() - timedelta(days=days)).delete()[0]
+
+    result['configurations'] = prune_configurations(batch_size)
+    logger.info(
+        f"pruned {result['backups']} backups in {result['batches']} batches, {result['configurations']} "
+        f"configurations and {result['runs']} ingest runs"
+    )
+    return result
+
+
+def delete_backups(ids, summarize: bool = True):
+    """
+    Delete backups, with their tags and journal entries, in a single transaction.
+
+    Args:
+        ids (list[int]): the backup ids
+        summarize (bool): add the backups to the `BackupSummary` of their device and date first
+
+    Returns:
+        (int): number of backups deleted
+    """
+    with transaction.atomic():
+        if summarize:
+            summarize_backups(ids)
+        _, deleted = Backup.objects.filter(pk__in=ids).defer(*DEFERRED_FIELDS).delete()
+        return deleted.get(Backup._meta.label, 0)
+
+
+def summarize_backups(ids):
+    """add backups to the `BackupSummary` of their device and processing date"""
+    rows = Backup.objects.filter(pk__in=ids).annotate(
+        date=TruncDate(Coalesce('last_processed', 'created'))
+    ).order_by().values('date', 'name').annotate(count=Count('pk'), device_id=Max('device_id'))
+    counts = {(row['date'], row['name']): row for row in rows if row['date']}
+    if not counts:
+        return
+
+    existing = {
+        (summary.date, summary.name): summary for summary in BackupSummary.objects.select_for_update().filter(
+            date__in={date for date, _ in counts}, name__in={name for _, name in counts})
+        if (summary.date, summary.name) in counts
+    }
+    new = []
+    for key, row in counts.items():
+        if summary := existing.get(key):
+            summary.backups += row['count']
+            summary.device_id = summary.device_id or row['device_id']
+        else:
+            new.append(BackupSummary(date=row['date'], name=row['name'], device_id=row['device_id'],
+                                     backups=row['count']))
+    BackupSummary.objects.bulk_update(existing.values(), ['backups', 'device'])
+    BackupSummary.objects.bulk_create(new)
+
+
+def prune_configurations(batch_size: int = None):
+    """
+    Delete the configurations no longer referenced by any backup, walking the store `batch_size` hashes at a time.
+    Each batch is a single statement in its own short transaction, under the exclusive configuration store lock: it
+    waits for the transactions writing backups (which may reference a configuration about to be deleted) and holds
+    new ones off only until the batch is deleted (see `Configuration.lock`).
+
+    Returns:
+        (int): number of configurations deleted
+    """
+    batch_size = batch_size or get_config().get('batch_size', 1000)
+    configurations = Configuration._meta.db_table
+    backups = Backup._meta.db_table
+    orig_config = Backup._meta.get_field('orig_config').column
+    rev_config = Backup._meta.get_field('rev_config').column
+
+    deleted = 0
+    last = ''
+    while hashes := list(Configuration.objects.filter(hash__gt=last).order_by('hash').values_list(
+            'hash', flat=True)[:batch_size]):
+        last = hashes[-1]
+        with transaction.atomic(), connection.cursor() as cursor:
+            Configuration.lock(shared=False)
+            cursor.execute(
+                f"DELETE FROM {configurations} c WHERE c.hash = ANY(%s) "
+                f"AND NOT EXISTS (SELECT 1 FROM {backups} b WHERE b.{orig_config} = c.hash) "
+                f"AND NOT EXISTS (SELECT 1 FROM {backups} b WHERE b.{rev_config} = c.hash)",
+                [hashes]
+            )
+            deleted += cursor.rowcount
+    return deleted
@@ -2,21 +2,31 @@
 Note this script is specific to Unimus
 
 This script is an example of how to perform the following:create backup db records
-    1. Get a list of devices with backups containing a diff within the last 24 hours from Unimus
+    1. Get a list of devices with backups containing a diff since the last run from Unimus
         2. Per the list of devices, get the last two backups for each.
             3. Create a diff of the last two backups.
-            4. Create an HTML rendering of the diff
-            5. Add a backup entry containing the device and backup info along with the diff HTML
+            4. Create an HTML rendering of the diff (see `utils.diff2html`), unless `render_at_ingest` is disabled
+            5. Add a backup entry containing the device and backup info along with the diff HTML; both
+               configurations are kept once each in the content addressed `Configuration` store
+
+Devices are streamed: each is stored as soon as its backups are fetched and diffed, so memory does not grow with
+the number of changed devices.
+
+The Unimus device to NetBox device index (`UnimusDevice`) is refreshed at the start of each run.
+
+With `shard` set, the processing is instead split into background jobs (see `backup_plugin.jobs`): the devices are
+fetched and stored in chunks by all the RQ workers in parallel.
+
+Runs are incremental: each run starts at the `until` of the last run that completed without errors (a `SyncState`
+checkpoint) and ends now, and devices whose latest backup pair is already stored are skipped. The first run starts at
+the current day at midnight.
 
 """
 from extras.scripts import *
 import logging
-import subprocess
-from bs4 import BeautifulSoup
 
-from dcim.models import Device
-from backup_plugin.utils import unimus
-from backup_plugin.models import Backup
+from backup_plugin.ingest import process
+from backup_plugin.jobs import IngestCoordinatorJob
 
 # logging.basicConfig(
 #     level=logging.INFO, stream=sys.stdout, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -24,61 +34,22 @@ from backup_plugin.models import Backup
 logger = logging.getLogger(f"backup_plugin.scripts.{__name__}")
 
 
-def process():
-    client = unimus.Client()
-
-    # get list of devices with backup diffs
-    data, diff_data = client.get_backups()
-    # print(diff_data)
-    # print(f"data: {data}")
-
-    errors = []
-
-    for k, v in (diff_data or {}).items():
-        logger.info(f"k: {k}, {v.keys()}, {v.get('backups')}")
-        if not v.get('backups'):
-            raise ValueError(f"No backups found for {k}")
-
-        # use Popen to pass diff to diff2html
-        _diff2html = subprocess.Popen([
-            'diff2html', '-i', 'stdin', '-s', 'line', '--lm', 'lines', '-o', 'stdout'
-        ], stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        _diff2html.stdin.write(v.get('diff'))
-        _diff2html.stdin.flush()
-        _out, _err = _diff2html.communicate()
-        _diff2html.wait()
-
-        # use Soup to extract just the diff table
-        _soup = BeautifulSoup(_out, 'html.parser')
-
-        # find the results table by class
-        _table = _soup.find('table', class_='d2h-diff-table')
-        if not _table:
-            errors.append(f"{k} No table found")
-            continue
-
-        # lookup the device by description
-        device = Device.objects.filter(name=k).first()
-
-        # create a record
-        Backup(
-            name=k, orig_id=v.get('backups')[0]['id'], rev_id=v.get('backups')[1]['id'],
-            diff_info=v.get('backups'),
-            device_id=getattr(device, 'id', None),
-            diff=str(_table)
-        ).save()
-
-    return errors
-
-
 class CreateBackupEntries(Script):
     class Meta:
         name = "create_backup_entries"
         description = "Creates backup entries"
 
+    shard = BooleanVar(
+        description="Split the processing into chunk jobs run in parallel by the background workers", required=False)
+
     def run(self, data, commit):
         try:
             self.log_info(f"Processing backups with arguments: {data}")
+            if data.get('shard'):
+                job = IngestCoordinatorJob.enqueue(user=self.request.user if self.request else None)
+                self.log_success(f"Enqueued the backup ingest (job {job.pk}); see its `Backup ingest chunk` jobs")
+                return
+
             errors = process()
             if errors:
                 for error in errors:
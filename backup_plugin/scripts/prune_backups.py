@@ -0,0 +1,33 @@
+"""
+Removes the backups past the retention policy (the `retention` settings, see `backup_plugin.retention`).
+
+The backups are removed by a `Backup retention` background job, in short batches, rather than in the script's own
+transaction. Schedule this script with an interval (ex: daily) to enforce the policy.
+
+"""
+from extras.scripts import *
+import logging
+
+from backup_plugin.jobs import RetentionJob
+from backup_plugin.retention import get_config
+
+logger = logging.getLogger(f"backup_plugin.scripts.{__name__}")
+
+
+class PruneBackups(Script):
+    class Meta:
+        name = "prune_backups"
+        description = "Removes the backups past the retention policy"
+
+    def run(self, data, commit):
+        config = get_config()
+        if not config.get('days') and not config.get('keep_last'):
+            self.log_warning("No retention policy: set `days` and/or `keep_last` in the `retention` settings")
+            return
+
+        try:
+            job = RetentionJob.enqueue(user=self.request.user if self.request else None)
+            self.log_success(f"Enqueued the backup retention (job {job.pk}) with {config}")
+        except Exception as e:
+            logger.exception(f"{e}")
+            self.log_failure(f"Error: {e}")
@@ -40,13 +40,34 @@ class BackupTable(NetBoxTable):
 
     last_processed = tables.DateTimeColumn(format='m/d/Y')
 
+    lines_added = tables.Column(verbose_name=_('Added'))
+    lines_removed = tables.Column(verbose_name=_('Removed'))
+    hunk_count = tables.Column(verbose_name=_('Hunks'))
+    section_count = tables.Column(verbose_name=_('Sections'))
+
     class Meta(NetBoxTable.Meta):
         model = Backup
         fields = (
-            'pk', 'id', 'name', 'device', 'manufacturer', 'Device Type' 'region', 'orig_id', 'rev_id', 'last_processed'
+            'pk', 'id', 'name', 'device', 'manufacturer', 'type', 'region', 'orig_id', 'rev_id', 'lines_added',
+            'lines_removed', 'hunk_count', 'section_count', 'last_processed'
+        )
+        default_columns = (
+            'name', 'device', 'manufacturer', 'type', 'region', 'orig_id', 'rev_id', 'lines_added', 'lines_removed',
+            'last_processed'
         )
-        default_columns = ('name', 'device', 'manufacturer', 'type', 'region', 'orig_id', 'rev_id', 'last_processed')
 
         # order last_processed descending so that the newest entries are first
         order_by = ('-last_processed', 'name')
 
+    def configure(self, request):
+        super().configure(request)
+        # search results are ordered by rank (see `BackupFilterSet.search`) unless a column is sorted in the request;
+        # the default and saved orderings are replaced and the current page is read again
+        data = self.data.data
+        ranked = hasattr(data, 'query') and 'rank' in data.query.annotations
+        if ranked and not request.GET.get(self.prefixed_order_by_field):
+            self.order_by = ()
+            self.data.data = data.order_by('-rank', '-last_processed')
+            if getattr(self, 'page', None):
+                self.page = self.paginator.page(self.page.number)
+
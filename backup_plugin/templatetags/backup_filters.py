@@ -11,7 +11,7 @@ logger = logging.getLogger(f"netbox.backup_plugin.{__name__}")
 @register.filter
 def utc_string_to_datetime(value, format_string="%Y-%m-%dT%H:%M:%SZ"):
     try:
-        logger.info(f"value: {value}, {type(value)}")
+        logger.debug("value: %s, %s", value, type(value))
         return datetime.fromisoformat(value).strftime(format_string)
     except (ValueError, TypeError):
         return None  # Handle invalid input gracefully
@@ -0,0 +1,64 @@
+from django.urls import reverse
+from rest_framework import status
+
+from utilities.testing import APITestCase
+
+from backup_plugin.models import Backup
+
+
+class BackupBulkUpsertTestCase(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add_permissions('backup_plugin.add_backup', 'backup_plugin.change_backup')
+        self.url = reverse('plugins-api:backup_plugin-api:backup-bulk-upsert')
+
+    def test_upsert(self):
+        data = [
+            {'name': 'device-1', 'orig_id': 2, 'rev_id': 1, 'unified_diff': '@@ -1 +1 @@\n-a\n+b'},
+            {'name': 'device-2', 'orig_id': 4, 'rev_id': 3},
+        ]
+        response = self.client.post(self.url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+
+        # posting the same backups again updates them
+        data[1]['changes'] = 'updated'
+        response = self.client.post(self.url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_201_CREATED)
+        self.assertEqual(Backup.objects.count(), 2)
+        self.assertEqual(Backup.objects.get(name='device-2').changes, 'updated')
+        self.assertEqual(Backup.objects.get(name='device-1').lines_added, 1)
+
+    def test_duplicate_backups(self):
+        data = [
+            {'name': 'device-1', 'orig_id': 2, 'rev_id': 1},
+            {'name': 'device-1', 'orig_id': 2, 'rev_id': 1, 'changes': 'again'},
+        ]
+        response = self.client.post(self.url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Backup.objects.exists())
+
+
+class BackupSearchTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Backup.objects.create(name='device-1', orig_id=2, rev_id=1, changes='ip route 10.0.0.0/8 192.0.2.1')
+        Backup.objects.create(
+            name='device-2', orig_id=4, rev_id=3, changes='ip route 10.0.0.0/8 192.0.2.1\nip route 0.0.0.0/0 192.0.2.2')
+        Backup.objects.create(name='router-3', orig_id=6, rev_id=5, changes='hostname router-3')
+
+    def setUp(self):
+        super().setUp()
+        self.add_permissions('backup_plugin.view_backup')
+        self.url = reverse('plugins-api:backup_plugin-api:backup-list')
+
+    def test_search(self):
+        # the changed lines are matched through the full text index, ranked, then the names by substring
+        response = self.client.get(f'{self.url}?q=route&limit=2', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual([backup['name'] for backup in response.data['results']], ['device-2', 'device-1'])
+
+        response = self.client.get(response.data['next'], **self.header)
+        self.assertEqual([backup['name'] for backup in response.data['results']], ['router-3'])
+        self.assertIsNone(response.data['next'])
@@ -0,0 +1,53 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from backup_plugin import ingest
+from backup_plugin.models import Backup, IngestRun
+
+
+class FakeClient:
+    """stands in for `unimus.Client`: one changed device"""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+
+    def iter_devices(self):
+        return iter([])
+
+    def iter_changed_backups(self, since, until):
+        return iter([{'id': 1, 'description': 'device-1'}])
+
+    def iter_backup_diffs(self, devices, skip=None):
+        if self.error:
+            raise self.error
+        for device in devices:
+            yield device['description'], {
+                'id': device['id'], 'diff': '@@ -1 +1 @@\n-a\n+b',
+                'backups': [{'id': 2, 'config': 'b\n'}, {'id': 1, 'config': 'a\n'}],
+            }
+
+
+class IngestTestCase(TestCase):
+
+    def test_process(self):
+        with mock.patch('backup_plugin.utils.unimus.get_client', return_value=FakeClient()):
+            self.assertEqual(ingest.process(), [])
+
+        # the backups are stored on the date of the run
+        run = IngestRun.objects.get()
+        backup = Backup.objects.get()
+        self.assertEqual(timezone.localdate(backup.last_processed), run.date)
+        self.assertEqual((run.stored, run.errors), (1, 0))
+        self.assertIsNotNone(run.completed)
+
+    def test_process_error(self):
+        with mock.patch('backup_plugin.utils.unimus.get_client', return_value=FakeClient(RuntimeError('boom'))):
+            with self.assertRaises(RuntimeError):
+                ingest.process()
+
+        # the run is completed all the same, with the error
+        run = IngestRun.objects.get()
+        self.assertIsNotNone(run.completed)
+        self.assertEqual((run.stored, run.errors), (0, 1))
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.utils import timezone
+
+from extras.models import Tag, TaggedItem
+
+from backup_plugin import retention
+from backup_plugin.models import Backup, BackupSummary, Configuration
+
+
+class RetentionTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tag = Tag.objects.create(name='Tag 1', slug='tag-1')
+        now = timezone.now()
+        Configuration.store({Configuration.get_hash(c): c for c in ('kept', 'orphan', 'orphan 2', 'orphan 3')})
+        cls.kept_config = Configuration.get_hash('kept')
+
+        # 4 daily backups of 2 devices, the newest first
+        for name in ('device-1', 'device-2'):
+            for day in range(4):
+                backup = Backup.objects.create(
+                    name=name, orig_id=day * 2 + 2, rev_id=day * 2 + 1, orig_config_id=cls.kept_config,
+                    last_processed=now - timedelta(days=day),
+                )
+                backup.tags.add(tag)
+
+    def test_keep_last(self):
+        result = retention.prune(keep_last=2, batch_size=3)
+
+        self.assertEqual(result['backups'], 4)
+        self.assertEqual(result['batches'], 2)
+        for name in ('device-1', 'device-2'):
+            self.assertEqual(
+                sorted(Backup.objects.filter(name=name).values_list('orig_id', flat=True)), [2, 4])
+
+        # the tags of the removed backups are removed with them
+        self.assertEqual(TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Backup)).count(), 4)
+
+        # one summary per device and date
+        self.assertEqual(BackupSummary.objects.count(), 4)
+        self.assertEqual(sum(BackupSummary.objects.values_list('backups', flat=True)), 4)
+
+        # only the configurations no backup references are removed, 3 hashes at a time
+        self.assertEqual(result['configurations'], 3)
+        self.assertEqual(list(Configuration.objects.values_list('hash', flat=True)), [self.kept_config])
+
+    def test_days(self):
+        result = retention.prune(days=2, keep_last=3, summarize=False)
+
+        # older than 2 days, beyond the 3 latest of each device
+        self.assertEqual(result['backups'], 2)
+        self.assertEqual(Backup.objects.count(), 6)
+        self.assertFalse(BackupSummary.objects.exists())
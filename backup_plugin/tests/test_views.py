@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Region, Site
+from extras.models import Tag
+from utilities.testing import TestCase
+
+from backup_plugin.models import Backup, IngestRun
+
+# backups on the list page (within the default page size)
+PAGE_SIZE = 25
+
+
+class BackupViewQueryCountTestCase(TestCase):
+    """
+    The number of queries of the backup list and detail views must not depend on the number of backups, nor on
+    their tags and related objects (see `BackupListView.queryset` and `BackupView.queryset`).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        manufacturer = Manufacturer.objects.create(name='Manufacturer 1', slug='manufacturer-1')
+        device_type = DeviceType.objects.create(manufacturer=manufacturer, model='Model 1', slug='model-1')
+        role = DeviceRole.objects.create(name='Role 1', slug='role-1')
+        region = Region.objects.create(name='Region 1', slug='region-1')
+        site = Site.objects.create(name='Site 1', slug='site-1', region=region)
+        cls.tags = [Tag.objects.create(name=f'Tag {i}', slug=f'tag-{i}') for i in range(3)]
+
+        devices = [
+            Device.objects.create(name=f'device-{i}', device_type=device_type, role=role, site=site)
+            for i in range(PAGE_SIZE)
+        ]
+        cls.backups = []
+        for i, device in enumerate(devices):
+            device.tags.set(cls.tags)
+            backup = Backup.objects.create(
+                name=device.name, device=device, orig_id=i * 2 + 2, rev_id=i * 2 + 1,
+                diff='<table></table>', unified_diff='@@ -1 +1 @@\n-a\n+b', changes='a\nb',
+            )
+            backup.tags.set(cls.tags)
+            cls.backups.append(backup)
+
+    def setUp(self):
+        super().setUp()
+        self.add_permissions('backup_plugin.view_backup')
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.assertHttpStatus(self.client.get(url), 200)
+        return len(context.captured_queries)
+
+    @staticmethod
+    def _listed(response):
+        """the backups of the list page's table"""
+        return {row.record.pk for row in response.context['table'].rows}
+
+    def test_list_view(self):
+        url = reverse('plugins:backup_plugin:backup_list')
+
+        # the queries of a page of a single backup, then of a full page (of all dates)
+        expected = self._count_queries(f'{url}?id={self.backups[0].pk}')
+        with self.assertNumQueries(expected):
+            response = self.client.get(f'{url}?last_processed=')
+        self.assertHttpStatus(response, 200)
+        self.assertEqual(self._listed(response), {backup.pk for backup in self.backups})
+
+    def test_detail_view(self):
+        # a backup (and device) without tags, then one with tags
+        backup = self.backups[0]
+        backup.tags.clear()
+        backup.device.tags.clear()
+        expected = self._count_queries(backup.get_absolute_url())
+
+        with self.assertNumQueries(expected):
+            response = self.client.get(self.backups[1].get_absolute_url())
+        self.assertHttpStatus(response, 200)
+        self.assertContains(response, self.tags[0].name)
+
+    def test_list_view_latest_run(self):
+        url = reverse('plugins:backup_plugin:backup_list')
+        processed = timezone.now() - timedelta(days=1)
+        latest = self.backups[:3]
+        Backup.objects.filter(pk__in=[backup.pk for backup in latest]).update(last_processed=processed)
+        IngestRun.objects.create(date=timezone.localdate(processed), started=processed, stored=len(latest))
+
+        # an unfiltered list defaults to the backups of the latest run, an empty date lists all of them
+        response = self.client.get(url)
+        self.assertHttpStatus(response, 200)
+        self.assertEqual(self._listed(response), {backup.pk for backup in latest})
+        response = self.client.get(f'{url}?last_processed=')
+        self.assertEqual(self._listed(response), {backup.pk for backup in self.backups})
+
+
+class BackupExportViewTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Backup.objects.create(name='device-1', orig_id=2, rev_id=1, last_processed=timezone.now())
+
+    def setUp(self):
+        super().setUp()
+        self.add_permissions('backup_plugin.view_backup')
+        self.url = reverse('plugins:backup_plugin:backup_export')
+
+    def test_export(self):
+        response = self.client.get(f'{self.url}?last_processed_after=2025-01-01')
+        self.assertHttpStatus(response, 200)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+
+    def test_invalid_filter(self):
+        response = self.client.get(f'{self.url}?last_processed_after=2025-13-01')
+        self.assertHttpStatus(response, 400)
+        self.assertIn('last_processed_after', response.json())
@@ -5,6 +5,7 @@ from .models import Backup
 
 urlpatterns = [
     path('backups/', views.BackupListView.as_view(), name='backup_list'),
+    path('backups/export/', views.BackupExportView.as_view(), name='backup_export'),
     path("backup/<int:pk>/", views.BackupView.as_view(), name="backup"),
     path("backup/<int:pk>/edit", views.BackupEditView.as_view(), name="backup_edit"),
     path("backup/<int:pk>/delete", views.BackupDeleteView.as_view(), name="backup_delete"),
@@ -0,0 +1,186 @@
+"""
+Cache helpers for the Unimus lookups rendered on the Device `Latest Backup` tab
+
+Uses NetBox's Django cache (Redis). The resolved Unimus device and the device's latest backup pair expire after
+`timeout` seconds. A rendered diff (and the HTML table of a `Backup` stored without one or of a revision of the
+device backup history, and each pairwise diff of that history) is keyed by its `(orig_id, rev_id)` backup pair so
+it never goes stale; at most `max_entries` of each are kept, the oldest being evicted first. Hits and misses are
+counted in process, as Prometheus metrics (see `metrics.CACHE_LOOKUPS`), so a lookup is a single cache read.
+
+Configuration (all optional):
+    PLUGINS_CONFIG = {
+        'backup_plugin': {
+            'cache': {
+                'alias': 'default',     # the Django cache to use
+                'timeout': 300,         # TTL of device and latest backup pair entries
+                'diff_timeout': 86400,  # TTL of rendered diff entries
+                'max_entries': 500,     # maximum number of rendered diff entries
+            }
+        }
+    }
+"""
+import logging
+
+from django.core.cache import caches
+
+from netbox.plugins import get_plugin_config
+
+from backup_plugin.utils import diff2html, metrics
+
+logger = logging.getLogger(f"netbox.plugins.{__name__}")
+
+# get this plugin's cache config from configuration.py
+config = get_plugin_config('backup_plugin', 'cache') or {}
+
+_MISSING = object()
+
+
+class BackupCache:
+    """
+    Thin wrapper around a Django cache that namespaces keys, bounds the number of diff entries and counts hits and
+    misses per kind of entry.
+    """
+    prefix = 'backup_plugin'
+
+    def __init__(self, alias: str = None, timeout: int = None, diff_timeout: int = None, max_entries: int = None):
+        self.alias = alias or config.get('alias', 'default')
+        self.timeout = timeout or config.get('timeout', 300)
+        self.diff_timeout = diff_timeout or config.get('diff_timeout', 86400)
+        self.max_entries = max_entries or config.get('max_entries', 500)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key(self, kind: str, *parts):
+        return ':'.join([self.prefix, kind, *[str(p) for p in parts]])
+
+    def get(self, kind: str, *parts, default=None):
+        value = self.cache.get(self.key(kind, *parts), _MISSING)
+        metrics.CACHE_LOOKUPS.labels(kind, 'miss' if value is _MISSING else 'hit').inc()
+        return default if value is _MISSING else value
+
+    def set(self, kind: str, *parts, value, timeout: int = None):
+        self.cache.set(self.key(kind, *parts), value, timeout or self.timeout)
+
+    def set_bounded(self, kind: str, *parts, value, timeout: int = None):
+        """
+        Set an entry and evict the oldest entries of this kind beyond `max_entries`. The key index is kept in the
+        cache itself so the bound is shared by all worker processes (best effort under concurrent writes).
+        """
+        key = self.key(kind, *parts)
+        index_key = self.key(kind, 'index')
+
+        keys = [k for k in self.cache.get(index_key) or [] if k != key]
+        keys.append(key)
+        if len(keys) > self.max_entries:
+            self.cache.delete_many(keys[:-self.max_entries])
+            keys = keys[-self.max_entries:]
+
+        self.cache.set(key, value, timeout or self.diff_timeout)
+        self.cache.set(index_key, keys, None)
+
+
+def get_device(client, name: str, backup_cache: BackupCache = None):
+    """
+    Get the Unimus device for a NetBox device name, from the cache when possible.
+
+    Returns:
+        (dict): The Unimus device, or an empty dict when Unimus does not know the device
+    """
+    backup_cache = backup_cache or BackupCache()
+
+    device = backup_cache.get('device', name)
+    if device is None:
+        device = client.get_device_by_name(name)
+        backup_cache.set('device', name, value=device)
+    return device
+
+
+def get_device_latest_backup_diff(client, device_id, backup_cache: BackupCache = None):
+    """
+    Get the diff between the last 2 backups of a Unimus device, from the cache when possible.
+
+    The latest backup pair of the device is cached for `timeout` seconds; the diff itself is cached by its
+    `(orig_id, rev_id)` pair, so a diff is only decoded and rendered once per pair.
+
+    Returns:
+        (dict): See `Client._render_diff`
+    """
+    backup_cache = backup_cache or BackupCache()
+
+    pair = backup_cache.get('latest', device_id)
+    if pair:
+        info = backup_cache.get('diff', *pair)
+        if info is not None:
+            return info
+
+    backups = client.get_device_backups(device_id, 0, 2) or []
+
+    # the newest backup is element 0 and the prior (orig) is element 1
+    pair = tuple(reversed([b['id'] for b in backups]))
+    info = backup_cache.get('diff', *pair) if len(pair) > 1 else None
+    if info is None:
+        info = client._render_diff(backups)
+        if len(pair) > 1:
+            backup_cache.set_bounded('diff', *pair, value=info)
+
+    backup_cache.set('latest', device_id, value=pair)
+    return info
+
+
+def get_diff_html(orig_id, rev_id, unified_diff: str, backup_cache: BackupCache = None):
+    """
+    The diff table of a backup pair, rendered from its unified diff once and then served from the cache.
+
+    Args:
+        orig_id: the newer backup id
+        rev_id: the prior backup id
+        unified_diff (str): the unified diff from `rev_id` to `orig_id`
+    """
+    backup_cache = backup_cache or BackupCache()
+    html = backup_cache.get('html', orig_id, rev_id)
+    if html is None:
+        html = diff2html.render(unified_diff)
+        backup_cache.set_bounded('html', orig_id, rev_id, value=html)
+    return html
+
+
+def get_device_backup_history(client, device_id, page: int = 0, size: int = 10, backup_cache: BackupCache = None):
+    """
+    Get one page of the backup history of a Unimus device, each revision with the diff from its prior revision.
+
+    Revisions are fetched page by page with `get_device_backups`. Each pairwise diff is computed once and cached by
+    its `(orig_id, rev_id)` pair, so paging through the history only decodes and diffs pairs not seen before.
+
+    Args:
+        page (int): page number (0 is the most recent)
+        size (int): number of revisions per page
+
+    Returns:
+        ((list), (bool)): the revisions, newest first (see `Client.get_backup_meta`, with the `diff` from the prior
+            revision and the `prior_id`, `None` for the oldest), and whether there are older revisions
+    """
+    backup_cache = backup_cache or BackupCache()
+
+    backups = client.get_device_backups(device_id, page, size) or []
+
+    # the prior revision of the last one of this page is the first of the next page: with a page size of 1 the
+    # page number is the position of the revision
+    if len(backups) == size:
+        backups += client.get_device_backups(device_id, (page + 1) * size, 1) or []
+
+    revisions = []
+    for newer, older in zip(backups[:size], backups[1:] + [None]):
+        revision = client.get_backup_meta(newer)
+        revision['diff'] = None
+        revision['prior_id'] = older['id'] if older else None
+        if older:
+            revision['diff'] = backup_cache.get('pair', older['id'], newer['id'])
+            if revision['diff'] is None:
+                # on copies: `_render_diff` drops the payloads it decodes and `older` is the `newer` of the next pair
+                revision['diff'] = client._render_diff([dict(newer), dict(older)], keep_configs=False)['diff']
+                backup_cache.set_bounded('pair', older['id'], newer['id'], value=revision['diff'])
+        revisions.append(revision)
+
+    return revisions, len(backups) > size
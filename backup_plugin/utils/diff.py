@@ -0,0 +1,438 @@
+"""
+Helpers for unified diffs (as produced by `Client._render_diff`)
+
+Two diff engines produce the same unified diff format:
+    * `histogram` (default): interns lines as integers, trims the common prefix and suffix, then recursively splits
+      the remaining regions around the lines that are unique to both sides (patience diff) or else around the rarest
+      common line (histogram diff, as `git diff --histogram`), using Myers' algorithm for small regions without a
+      rare common line. Stays fast on configurations of 100k+ lines.
+    * `difflib`: Python's `difflib.SequenceMatcher`, which slows down badly on large configurations.
+"""
+import difflib
+import re
+from bisect import bisect_left
+
+_HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+# lines occurring more often than this (ex: `!` or ` no shutdown`) are not used as anchors by the histogram diff
+MAX_CHAIN = 64
+
+# regions without a usable anchor are diffed with Myers' algorithm when they are at most this many lines (in total),
+# larger ones are treated as a single replacement
+MYERS_MAX_LINES = 2000
+
+
+class _Matcher(difflib.SequenceMatcher):
+    """A SequenceMatcher over precomputed matching blocks, used for its opcode grouping"""
+
+    def __init__(self, a, b, matching_blocks):  # noqa
+        self.a, self.b = a, b
+        self.matching_blocks = matching_blocks
+        self.opcodes = None
+
+
+def _myers(a, b, alo, ahi, blo, bhi, blocks):
+    """
+    Append the matching blocks of `a[alo:ahi]` and `b[blo:bhi]` found with Myers' O(ND) algorithm.
+    """
+    n, m = ahi - alo, bhi - blo
+    offset = n + m + 1
+    v = [0] * (2 * offset + 1)
+    trace = []
+
+    for d in range(n + m + 1):
+        # keep the diagonals -d-1..d+1 the backtrack below needs
+        trace.append(v[offset - d - 1:offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                break
+        else:
+            continue
+        break
+
+    # walk the trace back from (n, m) collecting the diagonals (snakes)
+    snakes = []
+    x, y = n, m
+    for d in range(len(trace) - 1, 0, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1 + d + 1] < v[k + 1 + d + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k + d + 1]
+        prev_y = prev_x - prev_k
+        # the snake follows the edit made from (prev_x, prev_y)
+        start_x = prev_x if prev_k == k + 1 else prev_x + 1
+        if x > start_x:
+            snakes.append((alo + start_x, blo + start_x - k, x - start_x))
+        x, y = prev_x, prev_y
+    if x > 0:
+        snakes.append((alo, blo, x))
+
+    blocks.extend(reversed(snakes))
+
+
+def _unique_anchors(a, b, alo, ahi, blo, bhi):
+    """
+    Find the lines that occur exactly once in both `a[alo:ahi]` and `b[blo:bhi]` and keep the longest chain of them
+    that appears in the same order in both (patience sorting), splitting a large region in a single pass.
+
+    Returns:
+        (list): the (i, j) positions of the chain
+    """
+    counts = {}
+    for i in range(alo, ahi):
+        counts[a[i]] = -1 if a[i] in counts else i
+    candidates = {}
+    for j in range(blo, bhi):
+        if counts.get(b[j], -1) >= 0:
+            candidates[b[j]] = None if b[j] in candidates else j
+
+    pairs = [(counts[line], j) for line, j in candidates.items() if j is not None]
+    pairs.sort(key=lambda pair: pair[1])
+
+    # longest increasing subsequence of the `a` positions, in `b` order
+    tails, tails_index, previous = [], [], [None] * len(pairs)
+    for index, (i, _) in enumerate(pairs):
+        position = bisect_left(tails, i)
+        if position == len(tails):
+            tails.append(i)
+            tails_index.append(index)
+        else:
+            tails[position] = i
+            tails_index[position] = index
+        previous[index] = tails_index[position - 1] if position else None
+
+    chain = []
+    index = tails_index[-1] if tails_index else None
+    while index is not None:
+        chain.append(pairs[index])
+        index = previous[index]
+    chain.reverse()
+    return chain
+
+
+def _anchor(a, b, alo, ahi, blo, bhi):
+    """
+    Find the histogram diff anchor of `a[alo:ahi]` and `b[blo:bhi]`: the longest common run around the line of `b`
+    that occurs the fewest times in `a` (at most `MAX_CHAIN` times).
+
+    Returns:
+        (tuple|None): the (i, j, size) of the anchor
+    """
+    positions = {}
+    for i in range(alo, ahi):
+        positions.setdefault(a[i], []).append(i)
+
+    best, best_count = None, MAX_CHAIN
+    j = blo
+    while j < bhi:
+        occurrences = positions.get(b[j])
+        next_j = j + 1
+        if occurrences and len(occurrences) <= best_count:
+            for i in occurrences:
+                start_i, start_j = i, j
+                while start_i > alo and start_j > blo and a[start_i - 1] == b[start_j - 1]:
+                    start_i -= 1
+                    start_j -= 1
+                end_i, end_j = i + 1, j + 1
+                while end_i < ahi and end_j < bhi and a[end_i] == b[end_j]:
+                    end_i += 1
+                    end_j += 1
+                if best is None or len(occurrences) < best_count or end_i - start_i > best[2]:
+                    best, best_count = (start_i, start_j, end_i - start_i), len(occurrences)
+                next_j = max(next_j, end_j)
+        j = next_j
+    return best
+
+
+def _histogram(a, b):
+    """
+    Returns:
+        (list): the matching blocks of `a` and `b` (as `SequenceMatcher.get_matching_blocks`) using a histogram
+            diff: common prefix/suffix trimming, then recursive splitting around rare common lines, with Myers'
+            algorithm for regions without a rare line
+    """
+    blocks = []
+    # regions still to diff and blocks found, processed in order (an explicit stack rather than recursion)
+    stack = [('region', 0, len(a), 0, len(b))]
+    while stack:
+        kind, alo, ahi, blo, bhi = stack.pop()
+        if kind == 'block':
+            blocks.append((alo, blo, ahi))
+            continue
+
+        # common prefix and suffix
+        prefix = 0
+        while alo + prefix < ahi and blo + prefix < bhi and a[alo + prefix] == b[blo + prefix]:
+            prefix += 1
+        suffix = 0
+        while ahi - suffix > alo + prefix and bhi - suffix > blo + prefix and \
+                a[ahi - suffix - 1] == b[bhi - suffix - 1]:
+            suffix += 1
+
+        if suffix:
+            stack.append(('block', ahi - suffix, suffix, bhi - suffix, None))
+        if prefix:
+            blocks.append((alo, blo, prefix))
+        alo, blo, ahi, bhi = alo + prefix, blo + prefix, ahi - suffix, bhi - suffix
+        if alo == ahi or blo == bhi:
+            continue
+
+        chain = _unique_anchors(a, b, alo, ahi, blo, bhi)
+        if chain:
+            # merge anchors that follow each other on both sides into runs
+            runs = []
+            for i, j in chain:
+                if runs and runs[-1][0] + runs[-1][2] == i and runs[-1][1] + runs[-1][2] == j:
+                    runs[-1][2] += 1
+                else:
+                    runs.append([i, j, 1])
+
+            # diff the gaps between the runs (pushed in reverse so they are processed in order)
+            end_i, end_j = ahi, bhi
+            for i, j, size in reversed(runs):
+                stack.append(('region', i + size, end_i, j + size, end_j))
+                stack.append(('block', i, size, j, None))
+                end_i, end_j = i, j
+            stack.append(('region', alo, end_i, blo, end_j))
+            continue
+
+        anchor = _anchor(a, b, alo, ahi, blo, bhi)
+        if anchor:
+            i, j, size = anchor
+            stack.append(('region', i + size, ahi, j + size, bhi))
+            stack.append(('block', i, size, j, None))
+            stack.append(('region', alo, i, blo, j))
+        elif (ahi - alo) + (bhi - blo) <= MYERS_MAX_LINES:
+            _myers(a, b, alo, ahi, blo, bhi, blocks)
+
+    # merge adjacent blocks and terminate with the sentinel, as SequenceMatcher does
+    merged = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        elif size:
+            merged.append((i, j, size))
+    merged.append((len(a), len(b), 0))
+    return merged
+
+
+def _grouped_opcodes(a_lines, b_lines, engine: str, n: int):
+    if engine == 'difflib':
+        return difflib.SequenceMatcher(None, a_lines, b_lines).get_grouped_opcodes(n)
+
+    # intern the lines so the histogram diff compares small integers rather than strings
+    ids = {}
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+    return _Matcher(a, b, _histogram(a, b)).get_grouped_opcodes(n)
+
+
+def _format_range(start, stop):
+    """convert a range to the unified diff format, as `difflib`"""
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f'{beginning}'
+    if not length:
+        beginning -= 1
+    return f'{beginning},{length}'
+
+
+def unified_diff_lines(a, b, fromfile: str = '', tofile: str = '', n: int = 3, engine: str = 'histogram'):
+    """
+    Generate the unified diff of two lists of lines, in the same format as `difflib.unified_diff(..., lineterm='')`.
+
+    Args:
+        a (list[str]): the older lines (left)
+        b (list[str]): the newer lines (right)
+        fromfile (str): label of the older lines
+        tofile (str): label of the newer lines
+        n (int): number of context lines
+        engine (str): `histogram` (default) or `difflib`
+
+    Yields:
+        (str): the lines of the unified diff
+    """
+    started = False
+    for group in _grouped_opcodes(a, b, engine, n):
+        if not started:
+            started = True
+            yield f'--- {fromfile}'
+            yield f'+++ {tofile}'
+
+        first, last = group[0], group[-1]
+        yield f'@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@'
+
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in a[i1:i2]:
+                    yield ' ' + line
+                continue
+            if tag in {'replace', 'delete'}:
+                for line in a[i1:i2]:
+                    yield '-' + line
+            if tag in {'replace', 'insert'}:
+                for line in b[j1:j2]:
+                    yield '+' + line
+
+
+def unified_diff(orig: str, rev: str, fromfile: str = '', tofile: str = '', engine: str = 'histogram'):
+    """
+    Create a unified diff between two configurations.
+
+    Note `lineterm=''` and the join with `\n` -- this handles formatting that is friendly with the javascript
+    Diff2HtmlUI (and `utils.diff2html`).
+
+    Args:
+        orig (str): the older configuration (left)
+        rev (str): the newer configuration (right)
+        fromfile (str): label of the older configuration, ex: its backup id
+        tofile (str): label of the newer configuration
+        engine (str): the diff algorithm, `histogram` (default, fast on large configurations) or `difflib`
+
+    Returns:
+        (str): the unified diff
+    """
+    return '\n'.join(unified_diff_lines(orig.splitlines(), rev.splitlines(), fromfile, tofile, engine=engine))
+
+
+def changed_lines(diff: str):
+    """
+    Extract the plain text of the added and removed lines of a unified diff, without their `+`/`-` prefix. This is
+    the text indexed for searching backups (the context lines and the diff markup are left out).
+
+    Args:
+        diff (str): the unified diff
+
+    Returns:
+        (str): the changed lines, one per line
+    """
+    lines = []
+    in_hunk = False
+    for line in (diff or '').splitlines():
+        if line.startswith('@@'):
+            in_hunk = True
+        elif in_hunk and line[:1] in ('+', '-'):
+            lines.append(line[1:])
+    return '\n'.join(lines)
+
+
+def change_stats(diff: str):
+    """
+    Measure a unified diff: the lines added and removed, the hunks, and the configuration sections changed.
+
+    A section is a top level line (ex: `interface GigabitEthernet0/1`) with the indented lines that follow it. A
+    changed line belongs to the last top level line seen in its hunk, or is a section itself when it is a top level
+    line (a top level line replaced by another is one section); changed lines seen in a hunk before any top level
+    line count as one section (whose header is not in the hunk's context). Blank lines and comments (`!`, `#`) are
+    neither sections nor changes of one.
+
+    Args:
+        diff (str): the unified diff
+
+    Returns:
+        (dict): `lines_added`, `lines_removed`, `hunk_count` and `section_count`
+    """
+    stats = {'lines_added': 0, 'lines_removed': 0, 'hunk_count': 0, 'section_count': 0}
+    sections = set()
+    # sections are keyed by the line number of their top level line in the newer configuration
+    section = None
+    line_no = 0
+    for line in (diff or '').splitlines():
+        match = _HUNK_HEADER.match(line) if line.startswith('@@') else None
+        if match:
+            stats['hunk_count'] += 1
+            line_no = int(match.group(3))
+            # the section of the lines before the first top level line of the hunk
+            section = ('hunk', stats['hunk_count'])
+            continue
+        if not stats['hunk_count'] or line.startswith('\\'):
+            # file headers, and "\ No newline at end of file"
+            continue
+
+        content = line[1:]
+        stripped = content.strip()
+        is_config = bool(stripped) and stripped[0] not in '!#'
+        if is_config and not content[0].isspace():
+            section = line_no
+        if line[:1] != '-':
+            line_no += 1
+        if line[:1] not in ('+', '-'):
+            continue
+
+        stats['lines_added' if line[0] == '+' else 'lines_removed'] += 1
+        if is_config:
+            sections.add(section)
+
+    stats['section_count'] = len(sections)
+    return stats
+
+
+def paginate(diff: str, page_lines: int = 1000):
+    """
+    Split the hunks of a unified diff into pages of at most `page_lines` lines (hunk headers aside), ex: to render a
+    huge diff a page at a time. The file headers are left out. A hunk that does not fit in a page is split into
+    several hunks, each with its own header, so every page is a valid diff on its own.
+
+    Args:
+        diff (str): the unified diff
+        page_lines (int): maximum number of lines per page
+
+    Returns:
+        (list[str]): the pages
+    """
+    pages = []
+    page = []
+    size = 0
+    # [old start, old count, new start, new count, lines] of the hunk being read
+    hunk = None
+
+    def _close():
+        if hunk and hunk[4]:
+            page.append(f'@@ -{hunk[0]},{hunk[1]} +{hunk[2]},{hunk[3]} @@')
+            page.extend(hunk[4])
+
+    for line in (diff or '').splitlines():
+        match = _HUNK_HEADER.match(line) if line.startswith('@@') else None
+        if match:
+            _close()
+            hunk = [int(match.group(1)), 0, int(match.group(3)), 0, []]
+            continue
+        if hunk is None:
+            # file headers, before the first hunk
+            continue
+        if line.startswith('\\'):
+            # "\ No newline at end of file"
+            hunk[4].append(line)
+            continue
+
+        if size >= page_lines:
+            # continue the hunk on the next page
+            _close()
+            pages.append('\n'.join(page))
+            page, size = [], 0
+            hunk = [hunk[0] + hunk[1], 0, hunk[2] + hunk[3], 0, []]
+
+        hunk[4].append(line)
+        size += 1
+        if not line.startswith('+'):
+            hunk[1] += 1
+        if not line.startswith('-'):
+            hunk[3] += 1
+
+    _close()
+    if page:
+        pages.append('\n'.join(page))
+    return pages
@@ -0,0 +1,178 @@
+"""
+Render a unified diff as a Diff2Html line-by-line diff table
+
+`render()` produces the same `table.d2h-diff-table` markup as `diff2html -s line --lm lines` (the table the daily
+processing used to extract from the Node.js output), so the bundled `diff2html.css` applies unchanged. It is pure
+Python and runs in-process; `render_node()` keeps the Node.js `diff2html` CLI available as a fallback.
+
+References:
+    https://diff2html.xyz/
+"""
+import html
+import re
+import subprocess
+from difflib import SequenceMatcher
+from itertools import zip_longest
+
+_HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@')
+_TOKENS = re.compile(r'\w+|\s+|[^\w\s]')
+
+# minimum similarity for a deleted and an inserted line to be shown as a changed line with word level highlights
+_MATCH_RATIO = 0.5
+
+
+def _escape(value: str):
+    return html.escape(value, quote=True).replace('/', '&#x2F;')
+
+
+def _line_numbers(old_number, new_number):
+    return (
+        f'<div class="line-num1">{old_number if old_number is not None else ""}</div>'
+        f'<div class="line-num2">{new_number if new_number is not None else ""}</div>'
+    )
+
+
+def _line(css: str, prefix: str, content: str, old_number=None, new_number=None):
+    """a code line; `content` must already be escaped"""
+    return (
+        f'<tr>'
+        f'<td class="d2h-code-linenumber {css}">{_line_numbers(old_number, new_number)}</td>'
+        f'<td class="{css}"><div class="d2h-code-line">'
+        f'<span class="d2h-code-line-prefix">{_escape(prefix) if prefix.strip() else "&nbsp;"}</span>'
+        f'<span class="d2h-code-line-ctn">{content or "<br>"}</span>'
+        f'</div></td>'
+        f'</tr>'
+    )
+
+
+def _info(content: str):
+    return (
+        f'<tr>'
+        f'<td class="d2h-code-linenumber d2h-info"></td>'
+        f'<td class="d2h-info"><div class="d2h-code-line">{_escape(content) or "&nbsp;"}</div></td>'
+        f'</tr>'
+    )
+
+
+def _highlight(old: str, new: str):
+    """word level highlight of a changed line, returns the escaped (old, new) content"""
+    old_tokens, new_tokens = _TOKENS.findall(old), _TOKENS.findall(new)
+    old_html, new_html = [], []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_tokens, new_tokens, autojunk=False).get_opcodes():
+        old_part, new_part = _escape(''.join(old_tokens[i1:i2])), _escape(''.join(new_tokens[j1:j2]))
+        if tag == 'equal':
+            old_html.append(old_part)
+            new_html.append(new_part)
+            continue
+        if old_part:
+            old_html.append(f'<del>{old_part}</del>')
+        if new_part:
+            new_html.append(f'<ins>{new_part}</ins>')
+    return ''.join(old_html), ''.join(new_html)
+
+
+def _changes(deleted: list, inserted: list):
+    """
+    Render a block of consecutive deleted and inserted lines. Deleted lines are paired with inserted lines in order;
+    similar pairs are rendered as changed lines with word level highlights, as diff2html does.
+    """
+    rows_del, rows_ins = [], []
+    for old, new in zip_longest(deleted, inserted):
+        if old is not None and new is not None and \
+                SequenceMatcher(None, old[1], new[1], autojunk=False).quick_ratio() >= _MATCH_RATIO:
+            old_html, new_html = _highlight(old[1], new[1])
+            rows_del.append(_line('d2h-del d2h-change', '-', old_html, old_number=old[0]))
+            rows_ins.append(_line('d2h-ins d2h-change', '+', new_html, new_number=new[0]))
+            continue
+        if old is not None:
+            rows_del.append(_line('d2h-del', '-', _escape(old[1]), old_number=old[0]))
+        if new is not None:
+            rows_ins.append(_line('d2h-ins', '+', _escape(new[1]), new_number=new[0]))
+    return rows_del + rows_ins
+
+
+def render(diff: str):
+    """
+    Render a unified diff (ex: `Client._render_diff()['diff']`) as a Diff2Html line-by-line table.
+
+    Args:
+        diff (str): the unified diff
+
+    Returns:
+        (str): the `table.d2h-diff-table` HTML
+    """
+    rows = []
+    deleted, inserted = [], []
+    old_number = new_number = 0
+
+    def _flush():
+        rows.extend(_changes(deleted, inserted))
+        deleted.clear()
+        inserted.clear()
+
+    for line in (diff or '').splitlines():
+        if line.startswith('@@'):
+            _flush()
+            match = _HUNK_HEADER.match(line)
+            if match:
+                old_number, new_number = int(match.group(1)), int(match.group(2))
+            rows.append(_info(line))
+        elif line.startswith(('---', '+++')) and not rows:
+            # file headers, before the first hunk
+            continue
+        elif line.startswith('-'):
+            deleted.append((old_number, line[1:]))
+            old_number += 1
+        elif line.startswith('+'):
+            inserted.append((new_number, line[1:]))
+            new_number += 1
+        elif line.startswith('\\'):
+            # "\ No newline at end of file"
+            continue
+        else:
+            _flush()
+            rows.append(_line('d2h-cntx', ' ', _escape(line[1:]), old_number, new_number))
+            old_number += 1
+            new_number += 1
+    _flush()
+
+    if not rows:
+        rows.append(
+            '<tr><td class="d2h-info"><div class="d2h-code-line">File without changes</div></td></tr>')
+
+    return '<table class="d2h-diff-table"><tbody class="d2h-diff-tbody">' + ''.join(rows) + '</tbody></table>'
+
+
+def render_node(diff: str):
+    """
+    Render a unified diff with the Node.js `diff2html` CLI (which must be installed) and extract its diff table.
+
+    Args:
+        diff (str): the unified diff
+
+    Returns:
+        (str|None): the `table.d2h-diff-table` HTML, or None when diff2html did not produce a table
+    """
+    from bs4 import BeautifulSoup
+
+    # use Popen to pass diff to diff2html
+    _diff2html = subprocess.Popen([
+        'diff2html', '-i', 'stdin', '-s', 'line', '--lm', 'lines', '-o', 'stdout'
+    ], stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    _out, _err = _diff2html.communicate(diff)
+
+    # use Soup to extract just the diff table by class
+    _table = BeautifulSoup(_out, 'html.parser').find('table', class_='d2h-diff-table')
+    return str(_table) if _table else None
+
+
+def render_html(diff: str, renderer: str = 'python'):
+    """
+    Render a unified diff with the given renderer, `python` (default) or `node`.
+
+    Returns:
+        (str|None): the `table.d2h-diff-table` HTML
+    """
+    if renderer == 'node':
+        return render_node(diff)
+    return render(diff)
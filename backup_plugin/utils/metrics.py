@@ -0,0 +1,117 @@
+"""
+Prometheus metrics of the Unimus client and the daily processing
+
+The metrics are registered in the default `prometheus_client` registry, so they are exported by NetBox's own
+`/metrics` endpoint (`METRICS_ENABLED = True`). The daily processing runs in the RQ worker: its metrics are only
+exported when `prometheus_client` runs in multiprocess mode (`PROMETHEUS_MULTIPROC_DIR`). When `prometheus_client` is
+not installed, the metrics are not recorded and only the per-run phase timings (see `totals()`) are kept.
+
+Metrics:
+    * `backup_plugin_unimus_request_seconds`: histogram of Unimus API request latency, by endpoint, method and status
+    * `backup_plugin_unimus_response_bytes_total`: bytes received from Unimus, by endpoint
+    * `backup_plugin_unimus_retries_total`: requests retried by the connection pool, by endpoint
+    * `backup_plugin_phase_seconds`: histogram of the time spent per phase (`fetch`, `decode`, `diff`, `render`,
+      `db_write`, ...)
+    * `backup_plugin_ingest_devices_total`: devices handled by the daily processing, by result (`stored`, `skipped`,
+      `error`)
+    * `backup_plugin_cache_lookups_total`: lookups of the Device `Latest Backup` tab cache, by kind of entry and
+      result (`hit`, `miss`)
+"""
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import Counter, Histogram
+except ImportError:
+    Counter = Histogram = None
+
+
+class _NoOp:
+    """stands in for a metric when `prometheus_client` is not installed"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, amount):
+        pass
+
+
+def _metric(cls, name: str, documentation: str, labelnames, **kwargs):
+    if cls is None:
+        return _NoOp()
+    return cls(name, documentation, labelnames, **kwargs)
+
+
+REQUEST_SECONDS = _metric(
+    Histogram, 'backup_plugin_unimus_request_seconds', 'Latency of the Unimus API requests',
+    ['endpoint', 'method', 'status'], buckets=(.025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60),
+)
+RESPONSE_BYTES = _metric(
+    Counter, 'backup_plugin_unimus_response_bytes', 'Bytes received from the Unimus API', ['endpoint'],
+)
+RETRIES = _metric(
+    Counter, 'backup_plugin_unimus_retries', 'Unimus API requests retried by the connection pool', ['endpoint'],
+)
+PHASE_SECONDS = _metric(
+    Histogram, 'backup_plugin_phase_seconds', 'Time spent per phase of fetching, diffing and storing backups',
+    ['phase'], buckets=(.001, .005, .01, .05, .1, .5, 1, 5, 10, 30, 60, 300),
+)
+INGEST_DEVICES = _metric(
+    Counter, 'backup_plugin_ingest_devices', 'Devices handled by the daily processing', ['result'],
+)
+CACHE_LOOKUPS = _metric(
+    Counter, 'backup_plugin_cache_lookups', 'Lookups of the Device Latest Backup tab cache', ['kind', 'result'],
+)
+
+# seconds spent per phase by this process (see `totals`)
+_totals = defaultdict(float)
+_totals_lock = threading.Lock()
+
+
+def endpoint(ep: str):
+    """
+    The endpoint label of a Unimus API path, without its query string and with the ids and names replaced so that
+    the number of label values stays bounded, ex: `/devices/42/backups?page=0` -> `devices/{id}/backups`
+    """
+    path = ep.split('?', 1)[0].strip('/')
+    path = re.sub(r'findByDescription/.*', 'findByDescription/{description}', path)
+    return re.sub(r'(?<=/)\d+(?=/|$)', '{id}', path)
+
+
+@contextmanager
+def timer(phase: str):
+    """time the enclosed block as `phase`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        PHASE_SECONDS.labels(phase).observe(elapsed)
+        with _totals_lock:
+            _totals[phase] += elapsed
+
+
+def totals():
+    """
+    Returns:
+        (dict): seconds spent per phase by this process so far (by all threads), ex: to report the time spent per
+            phase by a run as the difference of the totals at its end and at its start
+    """
+    with _totals_lock:
+        return dict(_totals)
+
+
+def record_request(ep: str, method: str, status, seconds: float, size: int = 0, retries: int = 0):
+    """record a Unimus API request; `status` is the HTTP status code, or `error` when no response was received"""
+    label = endpoint(ep)
+    REQUEST_SECONDS.labels(label, method.upper(), str(status)).observe(seconds)
+    if size:
+        RESPONSE_BYTES.labels(label).inc(size)
+    if retries:
+        RETRIES.labels(label).inc(retries)
@@ -5,25 +5,76 @@ References:
     https://wiki.unimus.net/display/UNPUB/Full+API+v.2+documentation
 """
 import base64
-import difflib
+import codecs
 import logging
-from datetime import datetime, timezone, time
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, time, timezone
+from itertools import islice
+from time import perf_counter
 
 import requests
 from requests import Request
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from netbox.plugins import get_plugin_config
 
+from backup_plugin.utils import diff, metrics
+
 logger = logging.getLogger(f"netbox.plugins.{__name__}")
 
 # get this plugin's config from configuration.py
 config = get_plugin_config('backup_plugin', 'unimus')
 
+# number of base64 characters decoded at a time by `Client.decode_lines` (a multiple of 4)
+DECODE_CHUNK_SIZE = 64 * 1024
+
+# the process-wide client returned by `get_client()`
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the Client shared by this process so that its pooled keep-alive connections are reused across
+    requests and script runs. A new Client is created after a fork as connections must not be shared with the
+    parent process.
+    """
+    global _client
+    with _client_lock:
+        if _client is None or _client.pid != os.getpid():
+            _client = Client()
+        return _client
+
 
 class Client:
     def __init__(self, base_url: str = None, token: str = None, **kwargs):
+        """
+        Args:
+            base_url (str): Base Unimus API URL (defaults to the `base_url` setting)
+            token (str): Unimus API token (defaults to the `token` setting)
+            **kwargs:
+                timeout (float|tuple): default (connect, read) timeout in seconds (defaults to the `timeout`
+                    setting, or (5, 30))
+                retries (int): number of retries on connection errors and `retry_status_forcelist` responses
+                    (defaults to the `retries` setting, or 3)
+                backoff_factor (float): exponential backoff factor between retries (defaults to the
+                    `backoff_factor` setting, or 0.5)
+                retry_status_forcelist (iterable): HTTP status codes that are retried (defaults to the
+                    `retry_status_forcelist` setting, or 429, 500, 502, 503 and 504)
+                pool_size (int): number of keep-alive connections kept per host (defaults to the `pool_size`
+                    setting, or the larger of 10 and `workers`)
+                diff_engine (str): the diff algorithm used by `_render_diff`, `histogram` or `difflib` (defaults to
+                    the plugin's `diff_engine` setting, or `histogram`)
+        """
         self._base_url = base_url or config['base_url']
         self._token = token or config['token']
+        self.pid = os.getpid()
+
+        self._diff_engine = kwargs.pop('diff_engine', None) or get_plugin_config(
+            'backup_plugin', 'diff_engine', 'histogram')
 
         self._session = requests.Session()
         self._session.verify = False
@@ -32,11 +83,52 @@ class Client:
             'Content-Type': 'application/json'
         }
 
-        self._timeout = kwargs.pop('timeout', None) or (5, 30)
+        _timeout = kwargs.pop('timeout', None) or config.get('timeout') or (5, 30)
+        self._timeout = tuple(_timeout) if isinstance(_timeout, (list, tuple)) else _timeout
+
+        # retry idempotent requests with backoff (honoring Retry-After), then let `execute` raise the final status
+        _retry = Retry(
+            total=kwargs.pop('retries', config.get('retries', 3)),
+            backoff_factor=kwargs.pop('backoff_factor', config.get('backoff_factor', 0.5)),
+            status_forcelist=kwargs.pop(
+                'retry_status_forcelist', config.get('retry_status_forcelist', (429, 500, 502, 503, 504))),
+            raise_on_status=False,
+        )
+
+        # size the pool so that every concurrent fetch (see `iter_backup_diffs`) gets a keep-alive connection
+        _pool_size = kwargs.pop('pool_size', None) or config.get('pool_size') or max(10, config.get('workers', 8))
+        _adapter = HTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size, max_retries=_retry)
+        self._session.mount('http://', _adapter)
+        self._session.mount('https://', _adapter)
+
+    def paginate(self, ep: str, params: dict = None, page_size: int = None):
+        """
+        Walk a paginated Unimus list endpoint, yielding its entries as each page arrives.
+
+        Args:
+            ep (str): The endpoint to call
+            params (dict): Additional query parameters (`page` and `size` are managed here)
+            page_size (int): Number of entries per page (defaults to the `page_size` setting, or 100)
+
+        Yields:
+            (dict): One entry of the response `data`
+        """
+        page_size = page_size or config.get('page_size', 100)
+        page = 0
+        while True:
+            data = self.execute(ep, params={**(params or {}), 'page': page, 'size': page_size}) or {}
+            entries = data.get('data') or []
+            yield from entries
+
+            # stop on a short page, or when Unimus reports this was the last page
+            total_pages = (data.get('paginator') or {}).get('totalPages')
+            if len(entries) < page_size or (total_pages is not None and page + 1 >= total_pages):
+                return
+            page += 1
 
     # region device
     def get_devices(self, page: int = None, size: int = None, attrs: str = None):
-        """get devices"""
+        """get devices (a single request; see `iter_devices` to walk all pages)"""
         params = {}
         if page is not None:
             params['page'] = page
@@ -47,6 +139,10 @@ class Client:
 
         return self.execute(f"/devices", params=params)
 
+    def iter_devices(self, attrs: str = None, page_size: int = None):
+        """lazily iterate over all devices, one page at a time"""
+        return self.paginate("/devices", params={'attrs': attrs} if attrs is not None else None, page_size=page_size)
+
     def get_device(self, device_id: str):
         """get device info by device_id"""
         return self.execute(f"/devices/{device_id}")
@@ -76,138 +172,190 @@ class Client:
 
     # endregion
 
-    def _render_diff(self, backups: list):
+    @staticmethod
+    def get_backup_meta(info: dict):
+        """helper: the id and validity (as ISO 8601 UTC strings) of a backup returned by `get_device_backups`"""
+        return {
+            'id': info['id'],
+            'valid_since': datetime.fromtimestamp(
+                info['validSince'], tz=timezone.utc).isoformat() if info.get('validSince') else None,
+            'valid_until': datetime.fromtimestamp(
+                info['validUntil'], tz=timezone.utc).isoformat() if info.get('validUntil') else None,
+        }
+
+    def _render_diff(self, backups: list, keep_configs: bool = True):
         """
         Renders a diff between two backups.
+
+        The base64 `bytes` payload of each backup is removed from its entry as soon as it is decoded, and decoded
+        incrementally (see `decode_lines`) so the full decoded payload is never held next to its lines.
+
         Args:
             backups (list): A list containing the orig and new backups (the last 2 backups)
+            keep_configs (bool): Whether the decoded configurations are returned (as the `config` of each backup);
+                when False only the diff and the backup metadata are kept
 
         Returns:
             (dict): A dictionary containing the backup meta/details and unified diff string
         """
         # get the last 2
         diff_data = {'backups': [], 'diff': None}
+        lines = []
         for info in backups or []:
-            logger.info(f"info: {info.keys()}")
-            diff_data['backups'].append({
-                'id': info['id'],
-                'valid_since': datetime.fromtimestamp(
-                    info['validSince'], tz=timezone.utc).isoformat() if info.get('validSince') else None,
-                'valid_until': datetime.fromtimestamp(
-                    info['validUntil'], tz=timezone.utc).isoformat() if info.get('validUntil') else None,
-                'config': self.decode(info['bytes'])
-            })
+            logger.debug("info: %s", info.keys())
+            meta = self.get_backup_meta(info)
+            data = info.pop('bytes', None) or ''
+            with metrics.timer('decode'):
+                if keep_configs:
+                    meta['config'] = ''.join(self.decode_lines(data, keepends=True))
+                    lines.append(meta['config'].splitlines())
+                else:
+                    lines.append(list(self.decode_lines(data)))
+            del data
+            diff_data['backups'].append(meta)
 
         if len(diff_data['backups']) > 1:
             # may not need the backup diff
             # diff_info = client.get_backup_diff(backup_data[0]['id'], backup_data[1]['id'])
 
-            # create a unified diff -- note `lineterm=''` and join with `\n` -- this handles formatting
-            # that is friendly with the javascript Diff2HtmlUI
             # note that the most recent backup (newest) is element 0 whereas the prior (old) is element 1
             # therefore the older should be on the left (as the first param) and the newer should be on the right
             # (as the 2nd param)
-            diff_data['diff'] = '\n'.join(list(difflib.unified_diff(
-                diff_data['backups'][1]['config'].splitlines(),
-                diff_data['backups'][0]['config'].splitlines(),
-                fromfile=str(diff_data['backups'][1]['id']),
-                tofile=str(diff_data['backups'][0]['id']),
-                lineterm=''
-            )))
+            with metrics.timer('diff'):
+                diff_data['diff'] = '\n'.join(diff.unified_diff_lines(
+                    lines[1],
+                    lines[0],
+                    fromfile=str(diff_data['backups'][1]['id']),
+                    tofile=str(diff_data['backups'][0]['id']),
+                    engine=self._diff_engine
+                ))
 
         return diff_data
 
-    def get_backups(self, since: int | None = None, until: int | None = None, limit: int | None = None):
+    @staticmethod
+    def get_description(backup: dict):
+        """helper: the name a changed device is keyed by (the Unimus description, which matches the NetBox name)"""
+        return backup.get('description') or f"{backup.get('address')} - {backup.get('model')}"
+
+    def get_backup_diff_info(self, backup: dict, skip=None, keep_configs: bool = True):
         """
-        Get all backups within `since` and `until, exclusive.
+        Get the last 2 backups of a changed device and render the diff.
 
-        All dates are UTC.
+        Args:
+            backup (dict): A device entry as returned by `devices/findByChangedBackup`
+            skip (callable|None): Optional `skip(orig_id, rev_id)` predicate called with the ids of the newest and
+                prior backups; when it returns True the backups are not decoded nor diffed
+            keep_configs (bool): See `_render_diff`
+
+        Returns:
+            (dict): A copy of the device entry updated with the `backups` and `diff` from `_render_diff`, or with
+                `skipped` set when `skip` matched
+        """
+        info = dict(backup, backups=[])
+        with metrics.timer('fetch'):
+            backups = self.get_device_backups(backup['id'], 0, 2) or []
+        if skip and len(backups) > 1 and skip(backups[0]['id'], backups[1]['id']):
+            return dict(info, diff=None, skipped=True)
+
+        info.update(self._render_diff(backups, keep_configs=keep_configs))
+        return info
+
+    def iter_backup_diffs(self, devices, workers: int | None = None, skip=None, keep_configs: bool = True):
+        """
+        Fetch and diff the backups of the given changed devices using a bounded pool of worker threads.
+
+        Results are yielded as they complete (not in the order of `devices`). A device that fails is yielded
+        with an `error` key rather than raising, so one bad device does not abort the rest of the run.
+
+        Args:
+            devices (iterable): Device entries as returned by `devices/findByChangedBackup`
+            workers (int|None): Number of concurrent fetches (defaults to the `workers` setting, or 8)
+            skip (callable|None): See `get_backup_diff_info`
+            keep_configs (bool): See `_render_diff`
+
+        Yields:
+            (str, dict): The device description and its diff info
+        """
+        workers = max(1, workers or config.get('workers', 8))
+
+        def _fetch(backup):
+            try:
+                return self.get_backup_diff_info(backup, skip=skip, keep_configs=keep_configs)
+            except Exception as e:
+                logger.exception(f"failed to fetch backups for device {backup.get('id')}: {e}")
+                return dict(backup, backups=[], diff=None, error=str(e))
+
+        if workers == 1:
+            for backup in devices:
+                yield self.get_description(backup), _fetch(backup)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='unimus') as executor:
+            pending = {}
+            devices = iter(devices)
+            while True:
+                # keep at most 2 fetches queued per worker so results do not pile up ahead of the consumer
+                for backup in islice(devices, workers * 2 - len(pending)):
+                    pending[executor.submit(_fetch, backup)] = backup
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    backup = pending.pop(future)
+                    yield self.get_description(backup), future.result()
+
+    def iter_changed_backups(self, since: int, until: int, page_size: int = None):
+        """lazily iterate over the devices with a changed backup between `since` and `until`, one page at a time"""
+        return self.paginate('devices/findByChangedBackup', params={'since': since, 'until': until},
+                             page_size=page_size)
+
+    def get_backups(self, since: int | None = None, until: int | None = None, limit: int | None = None,
+                    workers: int | None = None, page_size: int | None = None, skip=None):
+        """
+        Get all backups within `since` and `until`, exclusive, fetched and diffed concurrently (see
+        `iter_changed_backups` and `iter_backup_diffs`). All dates are UTC.
 
         Args:
             since(int|None): Unix Epoch start time (defaults to current day at midnight)
             until(int): Unix Epoch end time (defaults to end of current day)
             limit (int): Limit the number of backups to process. This is primarily limit processing for testing.
+            workers (int|None): See `iter_backup_diffs`
+            page_size (int|None): See `iter_changed_backups`
+            skip (callable|None): See `get_backup_diff_info`
 
         Returns:
-            ((dict), (list), (dict)): list of process_info, backups and relate diff_data dicts
+            ((dict), (list), (dict)): list of process_info, backups and relate diff_data dicts. Devices that
+                failed are listed in `process_info['errors']` and their diff_data entry contains an `error`.
         """
-        logger.info(f"-> {since}, {until}, {limit}")
-        if not since:
-            since = int(datetime.combine(datetime.now(), time.min).timestamp())
-        elif isinstance(since, int) and since < 1:
-            raise ValueError(f"parameter 'since' must be a positive integer, got {type(since)}")
-        elif isinstance(since, datetime):
-            since = int(since.timestamp())
-
-        if not until:
-            until = int(datetime.combine(datetime.now(), time.max).timestamp())
-        elif isinstance(until, int) and until < since:
-            raise ValueError(f"parameter 'until' must be a positive integer and > 'since', got {type(since)}")
-        elif isinstance(until, datetime):
-            until = int(until.timestamp())
-
-        _start = datetime.fromtimestamp(since, tz=timezone.utc)
-        _end = datetime.fromtimestamp(until, tz=timezone.utc)
+        since = int(since.timestamp()) if isinstance(since, datetime) else since
+        until = int(until.timestamp()) if isinstance(until, datetime) else until
+        since = since or int(datetime.combine(datetime.now(), time.min).timestamp())
+        until = until or int(datetime.combine(datetime.now(), time.max).timestamp())
+        if since < 1 or until < since:
+            raise ValueError(f"parameters 'since' and 'until' must be positive and 'since' <= 'until', "
+                             f"got {since}, {until}")
+
         process_info = {
-            "since": since, "until": until, "limit": limit, "start": _start.isoformat(), "end": _end.isoformat()
+            'since': since, 'until': until, 'limit': limit, 'errors': {},
+            'start': datetime.fromtimestamp(since, tz=timezone.utc).isoformat(),
+            'end': datetime.fromtimestamp(until, tz=timezone.utc).isoformat(),
         }
+        logger.debug("-> %s", process_info)
 
-        logger.info(f"-> {process_info}")
+        data = {'data': []}
 
-        diff_data = {}
-        _params = {'since': since, 'until': until}
-        if limit:
-            _params.update({'size': limit, 'page': 0})
-
-        data: dict = self.execute('devices/findByChangedBackup', params=_params) or []
-        for backup in data.get('data', {}):
-
-            description = backup.get('description') or f"{backup.get('address')} - {backup.get('model')}"
-            diff_data[description] = backup
-            diff_data[description]['backups'] = []
-
-            # get the last 2 backups and render the diff
-            diff_data[description].update(
-                self._render_diff(self.get_device_backups(backup['id'], 0, 2) or []))
-
-            '''
-            # get the last 2
-            backup_data = []
-            for info in self.get_device_backups(backup['id'], 0, 2) or []:
-                logger.info(f"info: {info.keys()}")
-                diff_data[description]['backups'].append({
-                    'id': info['id'],
-                    'valid_since': datetime.fromtimestamp(
-                        info['validSince'], tz=timezone.utc).isoformat() if info.get('validSince') else None,
-                    'valid_until': datetime.fromtimestamp(
-                        info['validUntil'], tz=timezone.utc).isoformat() if info.get('validUntil') else None,
-                })
-                backup_data.append({
-                    'id': info['id'],
-                    'config': self.decode(info['bytes'])
-                })
-
-            if len(backup_data) > 1:
-                # may not need the backup diff
-                # diff_info = client.get_backup_diff(backup_data[0]['id'], backup_data[1]['id'])
-
-                # create a unified diff -- note `lineterm=''` and join with `\n` -- this handles formatting
-                # that is friendly with the javascript Diff2HtmlUI
-                # note that the most recent backup (newest) is element 0 whereas the prior (old) is element 1
-                # therefore the older should be on the left (as the first param) and the newer should be on the right
-                # (as the 2nd param)
-                diff_data[description]['diff'] = '\n'.join(list(difflib.unified_diff(
-                    backup_data[1]['config'].splitlines(),
-                    backup_data[0]['config'].splitlines(),
-                    fromfile=str(backup_data[1]['id']),
-                    tofile=str(backup_data[0]['id']),
-                    lineterm=''
-                )))
-
-            else:
-                diff_data[description]['diff'] = None
-            '''
+        def _devices():
+            # walk the listing page by page so fetching can start before the full listing has downloaded
+            for backup in islice(self.iter_changed_backups(since, until, page_size=page_size), limit):
+                data['data'].append(backup)
+                yield backup
 
+        diff_data = {}
+        for description, info in self.iter_backup_diffs(_devices(), workers=workers, skip=skip):
+            if info.get('error'):
+                process_info['errors'][description] = info['error']
+            diff_data[description] = info
         return process_info, data, diff_data
 
     def get_backup_diff(self, orig_id: str, rev_id: str):
@@ -218,6 +366,28 @@ class Client:
         """helper: decode a base64 encoded string"""
         return base64.b64decode(data).decode('utf-8')
 
+    @staticmethod
+    def decode_lines(data: str, keepends: bool = False, chunk_size: int = DECODE_CHUNK_SIZE):
+        """
+        helper: decode a base64 encoded string incrementally, `chunk_size` characters at a time, and yield its lines
+        as `decode(data).splitlines(keepends)` would, without holding the whole decoded payload in memory.
+
+        `''.join(decode_lines(data, keepends=True))` is `decode(data)`. The payload must not be wrapped (Unimus sends
+        it on a single line).
+        """
+        chunk_size = max(4, chunk_size - chunk_size % 4)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        pending = ''
+        for start in range(0, len(data), chunk_size):
+            text = pending + decoder.decode(base64.b64decode(data[start:start + chunk_size]))
+
+            # lines ending past the last newline may continue in the next chunk
+            cut = text.rfind('\n') + 1
+            pending = text[cut:]
+            yield from text[:cut].splitlines(keepends)
+
+        yield from (pending + decoder.decode(b'', final=True)).splitlines(keepends)
+
     def execute(self, ep: str, method: str = 'get', **kwargs):
         """
         Calls the API with a given Verb, endpoint, etc.
@@ -227,13 +397,10 @@ class Client:
             **kwargs:
                 success_response_code (int): defaults to 200
                 data (dict): data/payload for post or put
+                params (dict): query parameters
+                timeout (float|tuple): (connect, read) timeout for this request (defaults to the client's timeout)
 
-                Potential args to add:
-                #retries (int): optional number of attempts (defaults to 0 retries)
-                #backoff_factor (float): optional delay in seconds between retries (defaults to 0.3)
-                #api_version (str): optional api_version (defaults to 'v1')
-                #status_forcelist: (iterable) A set of integer HTTP status codes that we should force a retry on.
-                #method_whitelist: (iterable) Set of upper-cased HTTP method verbs that we should retry on.
+                Retries and backoff are handled by the session's connection pool (see `__init__`).
 
         Returns:
             (List[Dict] | str)
@@ -241,6 +408,7 @@ class Client:
         _data = kwargs.pop('data', None)
         _params = kwargs.pop('params', None)
         _success_response_code = kwargs.pop('success_response_code', 200)
+        _timeout = kwargs.pop('timeout', None) or self._timeout
 
         # create a prepared request
         _prepared_req = Request(
@@ -251,10 +419,18 @@ class Client:
             json=_data if _data else None
         ).prepare()
 
-        logger.info(f"request: {_prepared_req.method} {_prepared_req.url}")
-
-        # remove 500 from default retry list as CG returns a 500
-        response = self._session.send(_prepared_req, timeout=self._timeout)
+        logger.debug("request: %s %s", _prepared_req.method, _prepared_req.url)
+
+        # time the request (retries included) and record it with its size and retry count (see `utils.metrics`)
+        start = perf_counter()
+        try:
+            response = self._session.send(_prepared_req, timeout=_timeout)
+        except requests.RequestException:
+            metrics.record_request(ep, method, 'error', perf_counter() - start)
+            raise
+        metrics.record_request(
+            ep, method, response.status_code, perf_counter() - start, size=len(response.content),
+            retries=len(getattr(getattr(response.raw, 'retries', None), 'history', None) or ()))
         response.raise_for_status()
 
         if 'application/json' in response.headers.get('Content-Type', ''):
@@ -1,6 +1,10 @@
+import csv
+import json
 import logging
 
-from django.db.models import Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.generic import View
 
 from . import forms, models, tables, filtersets
 from netbox.views.generic import ObjectEditView, ObjectListView, ObjectView, ObjectDeleteView
@@ -9,27 +13,103 @@ from utilities.views import ContentTypePermissionRequiredMixin, ViewTab, registe
 from netbox.views import generic
 from dcim.models import Device
 
-from backup_plugin.utils.unimus import config, Client
+from backup_plugin.utils import cache, diff, diff2html
+from backup_plugin.utils.unimus import config, get_client
 
 logger = logging.getLogger(f"netbox.plugins.backup_plugin.{__name__}")
 
+# rows fetched per round trip by the streaming export
+EXPORT_CHUNK_SIZE = 2000
+
 
 class BackupView(ObjectView):
-    queryset = models.Backup.objects.all()
+    # load every relation rendered by `Backup.attributes` up front
+    queryset = models.Backup.objects.select_related(
+        'device__device_type__manufacturer', 'device__site__region', 'device__platform', 'device__primary_ip4',
+    ).prefetch_related('device__tags', 'tags')
+
+    def get_extra_context(self, request, instance): # noqa
+        # rendered here (rather than at ingest) when only the unified diff was stored
+        return {
+            'diff_html': instance.diff_html,
+        }
 
 
 class BackupListView(ObjectListView):
-    queryset = models.Backup.objects.all()
-    # narrow list to the most recent daily backups
-    #queryset = models.Backup.objects.filter(
-    #    created__date=models.Backup.objects.aggregate(max_date=Max('created__date'))['max_date'])
+    # load the relations rendered by `BackupTable` up front and never load the (large) diff columns for a list
+    queryset = models.Backup.objects.select_related(
+        'device__device_type__manufacturer', 'device__site__region',
+    ).prefetch_related('tags').defer('diff', 'unified_diff', 'diff_info')
     table = tables.BackupTable
     filterset = filtersets.BackupFilterSet
     filterset_form = forms.BackupFilterForm
 
-    def __init__(self, *args, **kwargs):
-        super(BackupListView, self).__init__(*args, **kwargs)
-        logger.info(models.Backup.objects.aggregate(max_date=Max('created__date'))['max_date'])
+    # query parameters that do not filter the list
+    PAGING_PARAMS = ('page', 'per_page', 'sort')
+
+    def get(self, request, *args, **kwargs):
+        # an unfiltered list defaults to the backups of the latest ingest run; `?last_processed=` lists all dates
+        filtered = any(key not in self.PAGING_PARAMS for key in request.GET)
+        if not filtered and (latest := forms.get_latest_process_date()):
+            request.GET = request.GET.copy()
+            request.GET['last_processed'] = latest.isoformat()
+        return super().get(request, *args, **kwargs)
+
+
+class BackupExportView(ContentTypePermissionRequiredMixin, View):
+    """
+    Stream the backups matching the `BackupFilterSet` filters of the query string (ex: a date range with
+    `last_processed_after` and `last_processed_before`) as NDJSON (default) or CSV (`?format=csv`).
+
+    Rows are read with a server-side cursor, `EXPORT_CHUNK_SIZE` at a time, and written as they are read, so memory
+    use does not depend on the number of backups. The diff payloads are only exported when requested:
+    `?include=unified_diff` and/or `?include=diff` (the HTML table). Invalid filters are rejected (400) rather than
+    ignored, which would export every backup.
+    """
+    fields = (
+        'id', 'name', 'device_id', 'device__name', 'orig_id', 'rev_id', 'orig_config_id', 'rev_config_id',
+        'diff_info', 'changes', 'lines_added', 'lines_removed', 'hunk_count', 'section_count', 'last_processed',
+        'created', 'last_updated',
+    )
+    diff_fields = ('unified_diff', 'diff')
+
+    def get_required_permission(self):
+        return 'backup_plugin.view_backup'
+
+    def get(self, request):
+        include = set(request.GET.get('include', '').split(','))
+        fields = self.fields + tuple(f for f in self.diff_fields if f in include)
+
+        filterset = filtersets.BackupFilterSet(request.GET, models.Backup.objects.restrict(request.user, 'view'))
+        if not filterset.is_valid():
+            return JsonResponse(filterset.errors.get_json_data(), status=400)
+        queryset = filterset.qs.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        filename = f"backups_{timezone.now():%Y%m%d%H%M%S}"
+        if request.GET.get('format') == 'csv':
+            response = StreamingHttpResponse(self._csv(fields, queryset), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        else:
+            response = StreamingHttpResponse(self._ndjson(fields, queryset), content_type='application/x-ndjson')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.ndjson"'
+        return response
+
+    @staticmethod
+    def _ndjson(fields, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(fields, row)), default=str) + '\n'
+
+    @staticmethod
+    def _csv(fields, rows):
+        class _Echo:
+            """a file-like object returning what is written, for `csv.writer`"""
+            def write(self, value):
+                return value
+
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow([json.dumps(v) if isinstance(v, (dict, list)) else v for v in row])
 
 
 class BackupEditView(ObjectEditView):
@@ -47,17 +127,35 @@ class BackupViewTab(ViewTab):
         # probably will want to check the device role
         if not (instance.status == "active" and instance.primary_ip and
                 instance.role and instance.role not in config.get('ignored_device_roles', [])):
-            logger.info(f"instance: {instance.status}, {instance.primary_ip}, {instance.role}")
+            logger.debug("instance: %s, %s, %s", instance.status, instance.primary_ip, instance.role)
             return None
         return super().render(instance)
 
 
+def get_page(request):
+    """the `?page=` (0 based) of a request, 0 when missing or invalid"""
+    try:
+        return max(int(request.GET.get('page') or 0), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def get_unimus_device(client, instance, backup_cache):
+    """resolve the Unimus device of a Device from the local index, falling back to Unimus for devices not indexed yet"""
+    unimus_device = models.UnimusDevice.objects.filter(device=instance).first()
+    if unimus_device:
+        return unimus_device.info
+    return cache.get_device(client, instance.name, backup_cache)
+
+
 @register_model_view(Device, name="backup")
 class DeviceBackupView(generic.ObjectView):
     """
     View for Device Backup Info.
     * This view will is rendered on the Device's Page Tab Menu.
     * Currently, no permissions are required -- all users will have this permission to the Tools
+    * The tab is rendered without calling Unimus: the backups and the diff are loaded by htmx from
+      `DeviceBackupDiffView` and each configuration from `DeviceBackupConfigView` when it is expanded.
     """
     # additional_permissions = ["dcim.napalm_read_device"]
     queryset = Device.objects.all()
@@ -70,27 +168,126 @@ class DeviceBackupView(generic.ObjectView):
         weight=3200,
     )
 
+
+@register_model_view(Device, name="backup_diff", path="backup/diff")
+class DeviceBackupDiffView(generic.ObjectView):
+    """
+    Partial of the Device `Latest Backup` tab: the last 2 backups and a page of their diff (`?page=`, the first page
+    also lists the backups). Diffs are split in pages of `diff_page_lines` lines.
+    """
+    queryset = Device.objects.all()
+
+    def get_template_name(self):
+        if get_page(self.request) > 0:
+            return "backup_plugin/inc/device_backup_diff_page.html"
+        return "backup_plugin/inc/device_backup_diff.html"
+
     def get_extra_context(self, request, instance): # noqa
-        backup_info = {}
+        page = get_page(request)
         backup_data = []
-        diff = None
+        diff_html = None
+        next_page = None
 
         try:
-            client = Client()
-            backup_info = client.get_device_by_name(instance.name)
-            if not backup_info:
-                return {}
+            client = get_client()
+            backup_cache = cache.BackupCache()
+
+            backup_info = get_unimus_device(client, instance, backup_cache)
+            if backup_info:
+                # served from the cache when possible; see `utils.cache`
+                info = cache.get_device_latest_backup_diff(client, backup_info['id'], backup_cache)
+                backup_data = info.get('backups') or []
 
-            info = client.get_device_latest_backup_diff(backup_info['id'])
-            diff = info.get('diff')
-            backup_data = info.get('backups')
+                pages = diff.paginate(info.get('diff'), config.get('diff_page_lines', 1000))
+                if page < len(pages):
+                    diff_html = diff2html.render(pages[page])
+                if page + 1 < len(pages):
+                    next_page = page + 1
 
         except Exception as e:
             logger.exception(e)
 
         return {
-            'backup_info': backup_info,
             'backup_data': backup_data,
-            'diff': diff,
+            'diff_html': diff_html,
+            'page': page,
+            'next_page': next_page,
         }
 
+
+@register_model_view(Device, name="backup_config", path="backup/config")
+class DeviceBackupConfigView(generic.ObjectView):
+    """
+    Partial of the Device `Latest Backup` tab: the configuration of one of the last 2 backups (`?backup=`).
+    """
+    queryset = Device.objects.all()
+    template_name = "backup_plugin/inc/device_backup_config.html"
+
+    def get_extra_context(self, request, instance): # noqa
+        backup_id = request.GET.get('backup')
+        backup_config = None
+
+        try:
+            client = get_client()
+            backup_cache = cache.BackupCache()
+
+            backup_info = get_unimus_device(client, instance, backup_cache)
+            if backup_info and backup_id:
+                # the last 2 backups were cached with their configurations when the diff was loaded
+                info = cache.get_device_latest_backup_diff(client, backup_info['id'], backup_cache)
+                backup_config = next(
+                    (b.get('config') for b in info.get('backups') or [] if str(b['id']) == backup_id), None)
+
+        except Exception as e:
+            logger.exception(e)
+
+        return {
+            'backup_id': backup_id,
+            'backup_config': backup_config,
+        }
+
+
+@register_model_view(Device, name="backup_history", path="backup-history")
+class DeviceBackupHistoryView(generic.ObjectView):
+    """
+    View for the Device Backup History: a paginated timeline of the device's backups, each with the diff from its
+    prior backup.
+    * This view will is rendered on the Device's Page Tab Menu.
+    """
+    queryset = Device.objects.all()
+    template_name = "backup_plugin/device_backup_history.html"
+
+    tab = BackupViewTab(
+        label='Backup History',
+        weight=3210,
+    )
+
+    def get_extra_context(self, request, instance): # noqa
+        page = get_page(request)
+        size = config.get('history_page_size', 10)
+        revisions = []
+        has_next = False
+
+        try:
+            client = get_client()
+            backup_cache = cache.BackupCache()
+
+            backup_info = get_unimus_device(client, instance, backup_cache)
+            if backup_info:
+                revisions, has_next = cache.get_device_backup_history(
+                    client, backup_info['id'], page, size, backup_cache)
+                for revision in revisions:
+                    # memoized by backup pair, shared with `Backup.diff_html`
+                    revision['diff_html'] = cache.get_diff_html(
+                        revision['id'], revision['prior_id'], revision['diff'], backup_cache
+                    ) if revision['diff'] else None
+
+        except Exception as e:
+            logger.exception(e)
+
+        return {
+            'revisions': revisions,
+            'page': page,
+            'previous_page': page - 1 if page > 0 else None,
+            'next_page': page + 1 if has_next else None,
+        }
@@ -0,0 +1,68 @@
+"""
+Compare the diff engines of `utils/diff.py` on synthetic configurations.
+
+Usage:
+    python benchmarks/bench_diff.py [--repeat N] [--skip-difflib-above LINES]
+
+Results are printed as JSON.
+"""
+import argparse
+import json
+import time
+
+from synthetic import load, make_config, mutate
+
+CASES = (
+    # (config lines, change rate)
+    (1_000, 0.02),
+    (10_000, 0.01),
+    (50_000, 0.005),
+    (100_000, 0.001),
+    (100_000, 0.01),
+    (200_000, 0.001),
+)
+
+
+def _time(func, repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case, the best is reported')
+    parser.add_argument('--skip-difflib-above', type=int, default=None,
+                        help='do not run the (slow) difflib engine on configurations larger than this')
+    args = parser.parse_args()
+
+    diff = load('utils/diff.py')
+
+    results = []
+    for lines, change_rate in CASES:
+        orig = '\n'.join(make_config(lines))
+        rev = '\n'.join(mutate(make_config(lines), change_rate))
+
+        result = {'config_lines': lines, 'change_rate': change_rate}
+        for engine in ('histogram', 'difflib'):
+            if engine == 'difflib' and args.skip_difflib_above and lines > args.skip_difflib_above:
+                result[f'{engine}_seconds'] = None
+                continue
+            seconds, output = _time(lambda: diff.unified_diff(orig, rev, '1', '2', engine=engine), args.repeat)
+            result[f'{engine}_seconds'] = seconds
+            result[f'{engine}_changed_lines'] = sum(
+                1 for line in output.splitlines()[2:] if line[:1] in ('+', '-'))
+        if result['difflib_seconds']:
+            result['speedup'] = result['difflib_seconds'] / result['histogram_seconds']
+        results.append(result)
+
+    print(json.dumps({'benchmark': 'diff', 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
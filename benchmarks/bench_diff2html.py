@@ -0,0 +1,66 @@
+"""
+Compare the in-process diff table renderer with the Node.js diff2html CLI.
+
+Usage:
+    python benchmarks/bench_diff2html.py [--repeat N]
+
+The Node.js renderer is skipped when `diff2html` is not on the PATH (or BeautifulSoup is not installed). Results are
+printed as JSON.
+"""
+import argparse
+import json
+import shutil
+import time
+
+from synthetic import load, make_config, mutate, unified_diff
+
+CASES = (
+    # (config lines, change rate)
+    (200, 0.02),
+    (2_000, 0.01),
+    (20_000, 0.005),
+    (100_000, 0.001),
+)
+
+
+def _time(func, diff, repeat: int):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(diff)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='runs per case, the best is reported')
+    args = parser.parse_args()
+
+    diff2html = load('utils/diff2html.py')
+    try:
+        import bs4  # noqa: F401
+        node = shutil.which('diff2html') is not None
+    except ImportError:
+        node = False
+
+    results = []
+    for lines, change_rate in CASES:
+        orig = make_config(lines)
+        diff = unified_diff(orig, mutate(orig, change_rate))
+        result = {
+            'config_lines': lines,
+            'diff_lines': diff.count('\n') + 1,
+            'python_seconds': _time(diff2html.render, diff, args.repeat),
+            'node_seconds': _time(diff2html.render_node, diff, args.repeat) if node else None,
+        }
+        if result['node_seconds']:
+            result['speedup'] = result['node_seconds'] / result['python_seconds']
+        results.append(result)
+
+    print(json.dumps({'benchmark': 'diff2html', 'node_available': node, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
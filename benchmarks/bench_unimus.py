@@ -0,0 +1,266 @@
+"""
+Benchmark the plugin end to end against a local Unimus stand-in (see `fake_unimus.py`).
+
+Measures:
+    * `get_backups`: `Client.get_backups` throughput (changed devices fetched and diffed per second)
+    * `process`: `create_backup_entries.process` end-to-end time and peak (traced) memory
+    * `device_view`: latency of the Device `Latest Backup` tab (`DeviceBackupView`) and of its diff partial
+      (`DeviceBackupDiffView`), with a cold and a warm cache
+
+It runs inside NetBox (with this plugin installed and the database and cache reachable). The stand-in runs in a
+separate process, with the backups of the changed devices encoded up front, so that neither its CPU time nor its
+memory is measured. Everything written to the database (backups, configurations, a test device and user) is rolled
+back at the end of each benchmark.
+
+Usage:
+    python benchmarks/bench_unimus.py [--netbox-dir /opt/netbox/netbox] [--only get_backups,process,device_view]
+        [--devices 100] [--config-lines 2000] [--change-rate 0.01] [--changed 0.2] [--revisions 3] [--latency 0.0]
+        [--workers 8] [--repeat 20] [--output results.json] [--baseline previous.json]
+
+Results are printed (or written to `--output`) as JSON. With `--baseline` (the results of a previous release), the
+ratio of every measurement to the baseline is added under `vs_baseline`.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fake_unimus import Fleet, add_arguments
+
+BENCHMARKS = ('get_backups', 'process', 'device_view')
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _setup_django(netbox_dir: str):
+    sys.path.insert(0, netbox_dir)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'netbox.settings')
+
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def _serve(args):
+    """
+    Run `fake_unimus.py` in a subprocess.
+
+    Yields:
+        (str): its base URL
+    """
+    command = [
+        sys.executable, str(Path(__file__).with_name('fake_unimus.py')), '--port', '0', '--preload',
+        '--devices', str(args.devices), '--config-lines', str(args.config_lines),
+        '--change-rate', str(args.change_rate), '--changed', str(args.changed), '--revisions', str(args.revisions),
+        '--latency', str(args.latency),
+    ]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    try:
+        base_url = server.stdout.readline().strip()
+        if not base_url:
+            raise RuntimeError(f'fake_unimus.py exited with {server.wait()}')
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _latency(samples: list):
+    """summary of latency samples (in seconds) as milliseconds"""
+    samples = sorted(samples)
+    return {
+        'requests': len(samples),
+        'min_ms': samples[0] * 1000,
+        'median_ms': statistics.median(samples) * 1000,
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        'max_ms': samples[-1] * 1000,
+    }
+
+
+def _client(base_url: str):
+    """a Client for the stand-in, also installed as the process-wide client used by the script and the views"""
+    from backup_plugin.utils import unimus
+
+    unimus._client = unimus.Client(base_url=base_url, token='bench')
+    return unimus._client
+
+
+def bench_get_backups(base_url: str, fleet: Fleet, args):
+    client = _client(base_url)
+
+    start = time.perf_counter()
+    process_info, data, diff_data = client.get_backups(since=1, until=int(time.time()), workers=args.workers)
+    seconds = time.perf_counter() - start
+
+    return {
+        'devices': len(diff_data),
+        'errors': len(process_info['errors']),
+        'seconds': seconds,
+        'devices_per_second': len(diff_data) / seconds if seconds else None,
+    }
+
+
+def bench_process(base_url: str, fleet: Fleet, args):
+    from django.db import transaction
+
+    from backup_plugin.models import Backup
+    from backup_plugin.scripts import create_backup_entries
+
+    _client(base_url)
+
+    def _run(trace: bool):
+        result = {}
+        try:
+            with transaction.atomic():
+                if trace:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                errors = create_backup_entries.process()
+                result['seconds'] = time.perf_counter() - start
+                if trace:
+                    result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                result['backups'] = Backup.objects.filter(name__startswith='bench-device-').count()
+                result['errors'] = len(errors)
+                raise _Rollback()
+        except _Rollback:
+            pass
+        return result
+
+    # timed without tracing (which slows Python down), then run again to trace the memory
+    result = _run(trace=False)
+    result['peak_memory_bytes'] = _run(trace=True)['peak_memory_bytes']
+    return result
+
+
+def bench_device_view(base_url: str, fleet: Fleet, args):
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+    from django.test import Client as TestClient
+    from django.urls import reverse
+
+    from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Site
+
+    from backup_plugin.utils import cache
+
+    _client(base_url)
+    device_id = fleet.changed_ids[0] if fleet.changed_ids else 1
+    host = next((h for h in settings.ALLOWED_HOSTS if '*' not in h), 'localhost')
+    backup_cache = cache.BackupCache()
+
+    result = {}
+    try:
+        with transaction.atomic():
+            manufacturer = Manufacturer.objects.create(name='Bench Manufacturer', slug='bench-manufacturer')
+            device = Device.objects.create(
+                name=fleet.description(device_id),
+                device_type=DeviceType.objects.create(
+                    manufacturer=manufacturer, model='Bench Model', slug='bench-model'),
+                role=DeviceRole.objects.create(name='Bench Role', slug='bench-role'),
+                site=Site.objects.create(name='Bench Site', slug='bench-site'),
+                status='active',
+            )
+            client = TestClient()
+            client.force_login(get_user_model().objects.create_superuser('bench-user', 'bench@example.com', 'bench'))
+
+            def _get(url: str):
+                start = time.perf_counter()
+                response = client.get(url, HTTP_HOST=host)
+                elapsed = time.perf_counter() - start
+                if response.status_code != 200:
+                    raise RuntimeError(f'GET {url} returned {response.status_code}')
+                return elapsed
+
+            tab_url = reverse('dcim:device_backup', kwargs={'pk': device.pk})
+            diff_url = reverse('dcim:device_backup_diff', kwargs={'pk': device.pk})
+
+            result['tab'] = _latency([_get(tab_url) for _ in range(args.repeat)])
+
+            # the cached lookups of the device and its latest backup pair (see `utils.cache`)
+            newest, older = (fleet.backup_id(device_id, r) for r in (fleet.revisions - 1, fleet.revisions - 2))
+            cold = []
+            for _ in range(min(args.repeat, 5)):
+                backup_cache.cache.delete_many([
+                    backup_cache.key('device', device.name), backup_cache.key('latest', device_id),
+                    backup_cache.key('diff', older, newest),
+                ])
+                cold.append(_get(diff_url))
+            result['diff_cold'] = _latency(cold)
+            result['diff_warm'] = _latency([_get(diff_url) for _ in range(args.repeat)])
+            raise _Rollback()
+    except _Rollback:
+        pass
+    return result
+
+
+def _flatten(results: dict, prefix: str = ''):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f'{prefix}{key}.')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f'{prefix}{key}', value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--netbox-dir', default='/opt/netbox/netbox', help='the NetBox project directory')
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help='comma separated benchmarks to run')
+    add_arguments(parser)
+    parser.add_argument('--workers', type=int, default=8, help='concurrent fetches of `get_backups`')
+    parser.add_argument('--repeat', type=int, default=20, help='requests per view latency measurement')
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--baseline', help='results of a previous run to compare with')
+    args = parser.parse_args()
+
+    _setup_django(args.netbox_dir)
+    from backup_plugin import BackupPluginConfig
+
+    fleet = Fleet(args.devices, args.config_lines, args.change_rate, args.changed, args.revisions)
+    results = {}
+    names = args.only.split(',')
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error(f'unknown benchmark {name!r}, expected one of {", ".join(BENCHMARKS)}')
+
+    with _serve(args) as base_url:
+        for name in names:
+            results[name] = globals()[f'bench_{name}'](base_url, fleet, args)
+
+    output = {
+        'plugin_version': BackupPluginConfig.version,
+        'python': platform.python_version(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'parameters': {
+            k: getattr(args, k) for k in (
+                'devices', 'config_lines', 'change_rate', 'changed', 'revisions', 'latency', 'workers', 'repeat')
+        },
+        'results': results,
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = dict(_flatten(json.load(f).get('results', {})))
+        output['vs_baseline'] = {
+            key: value / baseline[key] for key, value in _flatten(results) if baseline.get(key)
+        }
+
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
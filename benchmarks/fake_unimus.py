@@ -0,0 +1,208 @@
+"""
+A local stand-in for the Unimus API v2, serving a synthetic fleet for the benchmarks.
+
+Serves (under any prefix, ex: `http://127.0.0.1:8085/api/v2/`):
+    * `GET /devices`
+    * `GET /devices/findByChangedBackup`
+    * `GET /devices/findByDescription/{description}`
+    * `GET /devices/{id}`
+    * `GET /devices/{id}/backups`
+
+List endpoints are paginated with `page` and `size` as Unimus does. Every device has `revisions` backups of about
+`config_lines` lines, each revision differing from the others by about `change_rate` of the lines; `changed` is the
+share of the fleet returned by `findByChangedBackup`. Every response is delayed by `latency` seconds.
+
+Usage (ex: to point a NetBox instance at it with `'base_url': 'http://127.0.0.1:8085/api/v2/'`):
+    python benchmarks/fake_unimus.py [--port 8085] [--devices 1000] [--config-lines 2000] [--change-rate 0.01]
+        [--changed 0.2] [--revisions 3] [--latency 0.05] [--preload]
+
+The base URL is printed on the first line of the output once the server accepts requests.
+"""
+import argparse
+import base64
+import contextlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from synthetic import make_config, mutate
+
+_DEVICES = re.compile(r'.*/devices(?:/(?P<id>\d+)(?P<backups>/backups)?|/(?P<action>findByChangedBackup)|'
+                      r'/findByDescription/(?P<description>[^/]+))?/?$')
+
+
+class Fleet:
+    """A synthetic fleet of devices and their backups"""
+
+    def __init__(self, devices: int = 100, config_lines: int = 2000, change_rate: float = 0.01,
+                 changed: float = 0.2, revisions: int = 3, seed: int = 0):
+        self.devices = devices
+        self.config_lines = config_lines
+        self.change_rate = change_rate
+        self.revisions = max(2, revisions)
+        self.start = int(time.time()) - self.revisions * 3600
+
+        ids = range(1, devices + 1)
+        self.changed_ids = sorted(random.Random(seed).sample(ids, round(devices * changed)))
+
+        # encoding a backup is much slower than serving it: keep the backups of the devices being fetched
+        self.backups = lru_cache(maxsize=256)(self._backups)
+
+    @staticmethod
+    def description(device_id: int):
+        return f'bench-device-{device_id:05d}'
+
+    def device(self, device_id: int):
+        return {
+            'id': device_id,
+            'uuid': f'00000000-0000-0000-0000-{device_id:012d}',
+            'address': f'10.{device_id // 65536 % 256}.{device_id // 256 % 256}.{device_id % 256}',
+            'description': self.description(device_id),
+            'model': 'CSR1000V',
+            'vendor': 'Cisco',
+            'type': 'IOS',
+            'lastJobStatus': 'SUCCESSFUL',
+        }
+
+    def backup_id(self, device_id: int, revision: int):
+        return device_id * 1000 + revision
+
+    def _backups(self, device_id: int):
+        """the backups of a device, newest first"""
+        config = make_config(self.config_lines, seed=device_id)
+        backups = []
+        for revision in range(self.revisions):
+            data = '\n'.join(mutate(config, self.change_rate, seed=revision)).encode('utf-8')
+            backups.append({
+                'id': self.backup_id(device_id, revision),
+                'validSince': self.start + revision * 3600,
+                'validUntil': self.start + (revision + 1) * 3600 - 1,
+                'type': 'TEXT',
+                'bytes': base64.b64encode(data).decode('ascii'),
+            })
+        return backups[::-1]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive, as the plugin's pooled session expects
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def _page(entries: list, query: dict):
+        page = int(query.get('page', ['0'])[0])
+        size = int(query.get('size', ['20'])[0])
+        return {
+            'data': entries[page * size:(page + 1) * size],
+            'paginator': {
+                'totalCount': len(entries), 'totalPages': math.ceil(len(entries) / size), 'page': page, 'size': size,
+            },
+        }
+
+    def do_GET(self):  # noqa
+        fleet: Fleet = self.server.fleet
+        time.sleep(self.server.latency)
+
+        if not self.headers.get('Authorization'):
+            return self._send(401, {'code': 401, 'message': 'Unauthorized'})
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        match = _DEVICES.match(re.sub('/+', '/', url.path))
+        if not match:
+            return self._send(404, {'code': 404, 'message': 'Not Found'})
+
+        if match['action']:
+            return self._send(200, self._page([fleet.device(i) for i in fleet.changed_ids], query))
+
+        if match['description']:
+            name = unquote(match['description'])
+            device_id = int(name.rsplit('-', 1)[-1]) if name.startswith('bench-device-') else 0
+            found = [fleet.device(device_id)] if 0 < device_id <= fleet.devices else []
+            return self._send(200, self._page(found, query))
+
+        if match['id']:
+            device_id = int(match['id'])
+            if not 0 < device_id <= fleet.devices:
+                return self._send(404, {'code': 404, 'message': 'Not Found'})
+            if match['backups']:
+                return self._send(200, self._page(fleet.backups(device_id), query))
+            return self._send(200, {'data': fleet.device(device_id)})
+
+        return self._send(200, self._page([fleet.device(i) for i in range(1, fleet.devices + 1)], query))
+
+
+@contextlib.contextmanager
+def running(fleet: Fleet, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0):
+    """
+    Serve `fleet` in a background thread.
+
+    Yields:
+        (str): the base URL to give to `Client` (ex: `http://127.0.0.1:40123/api/v2/`)
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.fleet = fleet
+    server.latency = latency
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://{host}:{server.server_address[1]}/api/v2/'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """the fleet and server options, shared with `bench_unimus.py`"""
+    parser.add_argument('--devices', type=int, default=100, help='number of devices in the fleet')
+    parser.add_argument('--config-lines', type=int, default=2000, help='lines per configuration')
+    parser.add_argument('--change-rate', type=float, default=0.01, help='share of lines changed between backups')
+    parser.add_argument('--changed', type=float, default=0.2, help='share of the fleet with a changed backup')
+    parser.add_argument('--revisions', type=int, default=3, help='backups per device')
+    parser.add_argument('--latency', type=float, default=0.0, help='delay added to every response, in seconds')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8085, help='0 to pick a free port')
+    parser.add_argument('--preload', action='store_true',
+                        help='encode the backups of every changed device up front (and keep them) before serving')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    fleet = Fleet(args.devices, args.config_lines, args.change_rate, args.changed, args.revisions)
+    if args.preload:
+        fleet.backups = lru_cache(maxsize=None)(fleet._backups)
+        for device_id in fleet.changed_ids:
+            fleet.backups(device_id)
+
+    with running(fleet, args.latency, args.host, args.port) as base_url:
+        print(base_url, flush=True)
+        print(f'serving {args.devices} devices (Ctrl+C to stop)', file=sys.stderr)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Helpers shared by the benchmarks: synthetic device configurations and loading plugin modules that do not need NetBox.
+"""
+import difflib
+import importlib.util
+import random
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent / 'backup_plugin'
+
+
+def load(relative_path: str):
+    """
+    Load a pure Python plugin module (ex: 'utils/diff2html.py') by path, so that the benchmark does not import the
+    `backup_plugin` package (and therefore NetBox).
+    """
+    path = PLUGIN_DIR / relative_path
+    spec = importlib.util.spec_from_file_location(f"backup_plugin_bench_{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_config(lines: int, seed: int = 0):
+    """
+    Returns:
+        (list): a router-like configuration of about `lines` lines: interface and ACL sections with indented
+            members, separated by `!` lines
+    """
+    rnd = random.Random(seed)
+    config = ['!', 'version 17.3', 'hostname bench-router', '!']
+    n = 0
+    while len(config) < lines:
+        n += 1
+        if n % 3:
+            config += [
+                f'interface GigabitEthernet0/{n}',
+                f' description uplink {rnd.randint(1, 9999)}',
+                f' ip address 10.{n % 256}.{rnd.randint(0, 255)}.1 255.255.255.0',
+                ' no shutdown',
+                '!',
+            ]
+        else:
+            config.append(f'ip access-list extended ACL-{n}')
+            config += [
+                f' permit tcp 10.{rnd.randint(0, 255)}.0.0 0.0.255.255 any eq {rnd.randint(1, 65535)}'
+                for _ in range(rnd.randint(5, 40))
+            ]
+            config.append('!')
+    return config[:lines]
+
+
+def mutate(config: list, change_rate: float = 0.01, seed: int = 1):
+    """
+    Returns:
+        (list): a copy of `config` where about `change_rate` of the lines are changed, removed or added
+    """
+    rnd = random.Random(seed)
+    revised = []
+    for line in config:
+        roll = rnd.random()
+        if roll >= change_rate:
+            revised.append(line)
+        elif roll < change_rate / 3:
+            revised.append(line + f' {rnd.randint(1, 99)}')
+        elif roll < change_rate * 2 / 3:
+            continue
+        else:
+            revised += [line, f' remark added {rnd.randint(1, 9999)}']
+    return revised
+
+
+def unified_diff(orig: list, rev: list):
+    """the unified diff as produced by `Client._render_diff`"""
+    return '\n'.join(difflib.unified_diff(orig, rev, fromfile='1', tofile='2', lineterm=''))